@@ -0,0 +1,92 @@
+import os
+
+# Base URL of a setup's Consul HTTP API; "{setup}" is replaced by the setup name.
+CONSUL_URL_TEMPLATE = os.getenv("CONSUL_URL_TEMPLATE", "https://{setup}-consul.greymatter.greyorange.com")
+
+CONSUL_MAX_CONNECTIONS = int(os.getenv("CONSUL_MAX_CONNECTIONS", "100"))
+CONSUL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CONSUL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+CONSUL_KEEPALIVE_EXPIRY = float(os.getenv("CONSUL_KEEPALIVE_EXPIRY", "30"))
+
+# Read timeout is the longest wait for the next chunk of a response, not for
+# the whole body.
+CONSUL_CONNECT_TIMEOUT = float(os.getenv("CONSUL_CONNECT_TIMEOUT", "3"))
+CONSUL_READ_TIMEOUT = float(os.getenv("CONSUL_READ_TIMEOUT", "10"))
+
+# Reads (GET) are retried on connection errors, timeouts and 5xx responses
+# with full-jitter exponential backoff. Writes are never retried.
+CONSUL_READ_RETRIES = int(os.getenv("CONSUL_READ_RETRIES", "2"))
+CONSUL_RETRY_BACKOFF = float(os.getenv("CONSUL_RETRY_BACKOFF", "0.1"))
+CONSUL_RETRY_BACKOFF_MAX = float(os.getenv("CONSUL_RETRY_BACKOFF_MAX", "2"))
+
+# A read still outstanding after this many seconds is sent again and the
+# first answer wins; 0 disables hedging.
+CONSUL_HEDGE_DELAY = float(os.getenv("CONSUL_HEDGE_DELAY", "0"))
+
+# After this many consecutive failures a setup's requests fail immediately,
+# with one trial request let through every CIRCUIT_RESET_TIMEOUT seconds.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Consul caps a single /v1/txn request at 64 operations and 512 KiB by default
+# (txn_max_req_len); raise these only if the servers are configured to match.
+CONSUL_TXN_MAX_OPS = int(os.getenv("CONSUL_TXN_MAX_OPS", "64"))
+CONSUL_TXN_MAX_BYTES = int(os.getenv("CONSUL_TXN_MAX_BYTES", str(512 * 1024)))
+
+CONSUL_CACHE_MAX_ENTRIES = int(os.getenv("CONSUL_CACHE_MAX_ENTRIES", "256"))
+CONSUL_CACHE_MAX_BYTES = int(os.getenv("CONSUL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Maximum in-flight Consul requests per setup. Overrides take the form
+# "setup-a=4,setup-b=16".
+CONSUL_SETUP_CONCURRENCY = int(os.getenv("CONSUL_SETUP_CONCURRENCY", "8"))
+CONSUL_SETUP_CONCURRENCY_OVERRIDES = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("CONSUL_SETUP_CONCURRENCY_OVERRIDES", "").split(",") if item.strip()
+    )
+}
+
+# Services fetched ahead of the one being written in format=ndjson responses.
+NDJSON_PREFETCH = int(os.getenv("NDJSON_PREFETCH", "4"))
+
+# Setup health is cached for HEALTH_TTL seconds and refreshed in the
+# background every HEALTH_PROBE_INTERVAL seconds for setups used within
+# HEALTH_IDLE_EXPIRY seconds.
+HEALTH_TTL = float(os.getenv("HEALTH_TTL", "30"))
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+HEALTH_IDLE_EXPIRY = float(os.getenv("HEALTH_IDLE_EXPIRY", "600"))
+
+# Upstream and phase timing for /metrics and the Server-Timing header.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Setup names come from the query string; only setups that have answered an
+# HTTP request get their own series, at most METRICS_MAX_SETUPS of them, and
+# every other name is reported as setup="other".
+METRICS_MAX_SETUPS = int(os.getenv("METRICS_MAX_SETUPS", "50"))
+
+# Background transfer jobs: state file and services transferred at once per job.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "consul_jobs.sqlite3")
+JOB_SERVICE_CONCURRENCY = int(os.getenv("JOB_SERVICE_CONCURRENCY", "4"))
+
+
+# Directory holding exported KV snapshots (<name>.jsonl.gz).
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+# Live watches: each (setup, service) holds one Consul blocking query of up to
+# WATCH_WAIT seconds, shared by every client watching it. Clients get an SSE
+# comment every WATCH_HEARTBEAT seconds; a client more than WATCH_QUEUE_SIZE
+# events behind is resent the full properties instead. Blocking queries use
+# their own pool of WATCH_MAX_CONNECTIONS connections, so they never take
+# connections from other reads; that many (setup, service) pairs can be
+# watched at once and new watches beyond it are refused.
+WATCH_MAX_CONNECTIONS = int(os.getenv("WATCH_MAX_CONNECTIONS", "50"))
+WATCH_WAIT = float(os.getenv("WATCH_WAIT", "300"))
+WATCH_HEARTBEAT = float(os.getenv("WATCH_HEARTBEAT", "15"))
+WATCH_QUEUE_SIZE = int(os.getenv("WATCH_QUEUE_SIZE", "100"))
+WATCH_RETRY_DELAY = float(os.getenv("WATCH_RETRY_DELAY", "2"))
+
+# Responses of at least COMPRESSION_MINIMUM_SIZE bytes are compressed with
+# brotli (if installed) or gzip when the client's Accept-Encoding allows it.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
\ No newline at end of file
@@ -1,8 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import get_or_post, transfer, compare
+from app import config
+from app.routes import get_or_post, transfer, compare, cache, health, metrics, jobs, snapshots, watch
+from app.services import consul_service
+from app.services.health import health_registry
+from app.services.jobs import job_runner
+from app.services.compression import CompressionMiddleware
+from app.services.metrics import ServerTimingMiddleware
+from app.services.watch import watch_hub
 
-app = FastAPI(title="Consul Update Helper", docs_url="/consul-update-helper/swagger-ui", redoc_url=None)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await consul_service.open_client()
+    health_registry.start()
+    await job_runner.start()
+    yield
+    await watch_hub.stop()
+    await job_runner.stop()
+    await health_registry.stop()
+    await consul_service.close_client()
+
+app = FastAPI(title="Consul Update Helper", docs_url="/consul-update-helper/swagger-ui", redoc_url=None, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,9 +31,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MINIMUM_SIZE, gzip_level=config.GZIP_LEVEL, brotli_quality=config.BROTLI_QUALITY)
+
+if config.METRICS_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 app.include_router(get_or_post.router)
 app.include_router(compare.router)
 app.include_router(transfer.router)
+app.include_router(jobs.router)
+app.include_router(snapshots.router)
+app.include_router(watch.router)
+app.include_router(cache.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     import uvicorn
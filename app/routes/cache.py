@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from app.services.kv_cache import snapshot_cache
+
+router = APIRouter()
+
+@router.get("/api/v1/consul/cache/stats")
+async def get_cache_stats():
+    return snapshot_cache.stats()
+
+@router.delete("/api/v1/consul/cache")
+async def clear_cache():
+    snapshot_cache.clear()
+    return {"message": "Consul snapshot cache cleared"}
\ No newline at end of file
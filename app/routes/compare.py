@@ -1,7 +1,16 @@
+import asyncio
+from typing import Dict, Any, List
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from app import config
+from app.services.concurrency import ordered_prefetch
+from app.services.health import health_registry
 from app.services.consul_service import ConsulService
+from app.services.diff import diff_matrix, diff_snapshots
+from app.services.kv_cache import decode_value
+from app.services.metrics import metrics
+from app.services.serialization import FastJSONResponse, dumps
 
 router = APIRouter()
 
@@ -10,81 +19,136 @@ class CompareRequest(BaseModel):
     destination_setup: str
     service_name: str
 
+async def compare_service(name: str, source_setup: str, destination_setup: str, use_cache: bool) -> Dict[str, Any]:
+    snapshot_1, snapshot_2 = await asyncio.gather(
+        ConsulService(source_setup, name, use_cache=use_cache).get_service_snapshot(),
+        ConsulService(destination_setup, name, use_cache=use_cache).get_service_snapshot()
+    )
+    with metrics.phase("diff"):
+        return diff_snapshots(name, snapshot_1, snapshot_2, source_setup, destination_setup)
+
+def stream_comparison(service_names: List[str], source_setup: str, destination_setup: str, use_cache: bool) -> StreamingResponse:
+    async def fetch(name: str) -> Dict[str, Any]:
+        return await compare_service(name, source_setup, destination_setup, use_cache)
+
+    async def lines():
+        async for name, result in ordered_prefetch(service_names, fetch, config.NDJSON_PREFETCH):
+            with metrics.phase("serialize"):
+                line = dumps({"service": name, "result": result}) + b"\n"
+            yield line
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/api/v1/consul/properties/compare", response_model=dict)
 async def compare_properties_between_two_setups(
     source_setup: str = Query(...),
     destination_setup: str = Query(...),
-    service_name: str = Query(...)
+    service_name: str = Query(...),
+    no_cache: bool = Query(False),
+    format: str = Query("json")
 ):
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="Invalid 'format'. Expected 'json' or 'ndjson'.")
+    
     try:
-        source_validator = ConsulService(source_setup, "")
-        if not source_validator.validate_setup():
+        source_validator = ConsulService(source_setup, "", use_cache=not no_cache)
+        dest_validator = ConsulService(destination_setup, "", use_cache=not no_cache)
+        source_ok, dest_ok = await asyncio.gather(health_registry.is_available(source_setup), health_registry.is_available(destination_setup))
+        if not source_ok:
             raise HTTPException(status_code=404, detail=f"Error: Source setup '{source_setup}' is not accessible.")
         
-        dest_validator = ConsulService(destination_setup, "")
-        if not dest_validator.validate_setup():
+        if not dest_ok:
             raise HTTPException(status_code=404, detail=f"Error: Destination setup '{destination_setup}' is not accessible.")
         
-        source_services = source_validator.get_available_services()
-        dest_services = dest_validator.get_available_services()
+        if service_name.lower() == "all" and format == "ndjson":
+            source_services, dest_services = await asyncio.gather(source_validator.get_available_services(), dest_validator.get_available_services())
+            all_services = list(dict.fromkeys(source_services + dest_services))
+            if not all_services:
+                raise HTTPException(status_code=404, detail="No services found in either setup")
+            return stream_comparison(all_services, source_setup, destination_setup, not no_cache)
         
         if service_name.lower() == "all":
-            all_services = list(set(source_services) | set(dest_services))
+            source_snapshot, dest_snapshot = await asyncio.gather(source_validator.get_all_services_snapshot(), dest_validator.get_all_services_snapshot())
+            all_services = list(set(source_snapshot.data if source_snapshot else {}) | set(dest_snapshot.data if dest_snapshot else {}))
             if not all_services:
                 raise HTTPException(status_code=404, detail="No services found in either setup")
-            service_names = all_services
+            with metrics.phase("diff"):
+                results = {
+                    name: diff_snapshots(name, source_snapshot, dest_snapshot, source_setup, destination_setup, service_key=name)
+                    for name in all_services
+                }
         else:
+            source_services, dest_services = await asyncio.gather(source_validator.get_available_services(), dest_validator.get_available_services())
             service_names = [name.strip() for name in service_name.split(',')]
             invalid_services = [name for name in service_names if name not in source_services and name not in dest_services]
             if invalid_services:
                 raise HTTPException(status_code=404, detail=f"Error: Services not found in either setup: {', '.join(invalid_services)}")
-        
-        results = {}
-        
-        for service_name in service_names:
-            consul_service_1 = ConsulService(source_setup, service_name)
-            properties_1 = consul_service_1.get_all_keys()
             
-            consul_service_2 = ConsulService(destination_setup, service_name)
-            properties_2 = consul_service_2.get_all_keys()
+            if format == "ndjson":
+                return stream_comparison(service_names, source_setup, destination_setup, not no_cache)
             
-            if not properties_1 and not properties_2:
-                results[service_name] = {
-                    "status": "error",
-                    "message": f"Service '{service_name}' does not exist in either setup"
-                }
-                continue
-            
-            if not properties_1:
-                properties_1 = {}
-            if not properties_2:
-                properties_2 = {}
-            keys_1 = set(properties_1.keys())
-            keys_2 = set(properties_2.keys())
-
-            source_exclusive = {key: properties_1[key] for key in keys_1 - keys_2}
-            destination_exclusive = {key: properties_2[key] for key in keys_2 - keys_1}
-            
-            common_keys = keys_1 & keys_2
-            different_values = {}
-            
-            for key in common_keys:
-                if properties_1[key] != properties_2[key]:
-                    different_values[key] = {
-                        f"{source_setup}": properties_1[key],
-                        f"{destination_setup}": properties_2[key]
-                    }
-            
-            results[service_name] = {
-                f"exclusive_to_{source_setup}": source_exclusive,
-                f"exclusive_to_{destination_setup}": destination_exclusive,
-                "common_keys_with_different_values": different_values
-            }
+            # Both setups and every service are fetched at once; the per-setup
+            # limits in ConsulService keep each Consul server from being flooded.
+            compared = await asyncio.gather(*(compare_service(name, source_setup, destination_setup, not no_cache) for name in service_names))
+            results = dict(zip(service_names, compared))
         
-        return JSONResponse(content={
-            "source_setup": source_setup,
-            "destination_setup": destination_setup,
-            "results": results
-        })
+        with metrics.phase("serialize"):
+            return FastJSONResponse(content={
+                "source_setup": source_setup,
+                "destination_setup": destination_setup,
+                "results": results
+            })
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@router.get("/api/v1/consul/properties/compare/matrix", response_model=dict)
+async def compare_properties_across_setups(
+    setups: str = Query(..., description="Comma-separated setup names"),
+    service_name: str = Query(...),
+    baseline: str = Query(None, description="Setup the others are compared against; defaults to the first"),
+    no_cache: bool = Query(False)
+):
+    setup_names = list(dict.fromkeys(name.strip() for name in setups.split(',') if name.strip()))
+    if len(setup_names) < 2:
+        raise HTTPException(status_code=400, detail="At least two setups are required.")
+    baseline = baseline or setup_names[0]
+    if baseline not in setup_names:
+        raise HTTPException(status_code=400, detail=f"Baseline setup '{baseline}' must be one of the compared setups.")
+
+    available = await asyncio.gather(*(health_registry.is_available(setup) for setup in setup_names))
+    unavailable = [setup for setup, ok in zip(setup_names, available) if not ok]
+    if unavailable:
+        raise HTTPException(status_code=404, detail=f"Error: Setups not accessible: {', '.join(unavailable)}")
+
+    # Every setup is read exactly once and all reads run concurrently.
+    if service_name.lower() == "all":
+        snapshots = await asyncio.gather(*(ConsulService(setup, "", use_cache=not no_cache).get_all_services_snapshot() for setup in setup_names))
+        trees = [snapshot.data if snapshot else {} for snapshot in snapshots]
+        service_names = list(dict.fromkeys(name for tree in trees for name in tree))
+        if not service_names:
+            raise HTTPException(status_code=404, detail="No services found in any setup")
+        properties = {name: [tree.get(name, {}) for tree in trees] for name in service_names}
+    else:
+        service_names = [name.strip() for name in service_name.split(',')]
+        fetched = await asyncio.gather(*(
+            ConsulService(setup, name, use_cache=not no_cache).get_encoded_keys()
+            for name in service_names
+            for setup in setup_names
+        ))
+        properties = {
+            name: list(fetched[index * len(setup_names):(index + 1) * len(setup_names)])
+            for index, name in enumerate(service_names)
+        }
+
+    with metrics.phase("diff"):
+        results = {
+            name: diff_matrix(name, dict(zip(setup_names, properties[name])), baseline, decode_value)
+            for name in service_names
+        }
+
+    with metrics.phase("serialize"):
+        return FastJSONResponse(content={
+            "baseline": baseline,
+            "setups": setup_names,
+            "results": results
+        })
\ No newline at end of file
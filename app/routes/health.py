@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from app.services.health import health_registry
+
+router = APIRouter()
+
+@router.get("/api/v1/consul/health")
+async def get_setup_health():
+    return health_registry.status()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import JSONResponse
+from app.routes.transfer import TransferRequest
+from app.services.consul_service import ConsulService
+from app.services.health import health_registry
+from app.services.jobs import job_runner
+
+router = APIRouter()
+
+@router.post("/api/v1/consul/properties/transfer/jobs")
+async def create_transfer_job(request: TransferRequest = Body(..., example={"source_setup": "source_setup-name", "destination_setup": "destination_setup-name", "service_name": "service1-name, service2-name", "mode": "overwrite", "delete_extraneous": False})):
+    source_setup = request.source_setup
+    destination_setup = request.destination_setup
+
+    if request.dry_run:
+        raise HTTPException(status_code=400, detail="dry_run is not supported for transfer jobs; use /api/v1/consul/properties/transfer instead.")
+
+    if not isinstance(destination_setup, str):
+        raise HTTPException(status_code=400, detail="Transfer jobs take a single destination_setup; start one job per destination.")
+
+    source_ok, dest_ok = await asyncio.gather(health_registry.is_available(source_setup), health_registry.is_available(destination_setup))
+    if not source_ok:
+        raise HTTPException(status_code=404, detail=f"Error: Source setup '{source_setup}' is not accessible.")
+
+    if not dest_ok:
+        raise HTTPException(status_code=404, detail=f"Error: Destination setup '{destination_setup}' is not accessible.")
+
+    source_services = await ConsulService(source_setup, "").get_available_services()
+    service_names = list(dict.fromkeys(name.strip() for name in request.service_name.split(',')))
+    invalid_services = [name for name in service_names if name not in source_services]
+    if invalid_services:
+        raise HTTPException(status_code=404, detail=f"Error: Services not found in source setup: {', '.join(invalid_services)}")
+
+    job_id = await job_runner.submit(source_setup, destination_setup, service_names, request.mode, request.delete_extraneous)
+    return JSONResponse(status_code=202, content={
+        "message": f"Transfer job started from '{source_setup}' to '{destination_setup}'",
+        "job_id": job_id,
+        "status_url": f"/api/v1/consul/properties/transfer/jobs/{job_id}"
+    })
+
+@router.get("/api/v1/consul/properties/transfer/jobs/{job_id}")
+async def get_transfer_job(job_id: str):
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Error: Transfer job '{job_id}' not found.")
+    return job
+
+@router.post("/api/v1/consul/properties/transfer/jobs/{job_id}/resume")
+async def resume_transfer_job(job_id: str):
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Error: Transfer job '{job_id}' not found.")
+    if job_runner.is_running(job_id):
+        raise HTTPException(status_code=409, detail=f"Error: Transfer job '{job_id}' is already running.")
+    if job["status"] == "completed":
+        raise HTTPException(status_code=409, detail=f"Error: Transfer job '{job_id}' has already completed.")
+
+    job_runner.resume(job_id)
+    return JSONResponse(status_code=202, content={
+        "message": f"Transfer job '{job_id}' resumed",
+        "job_id": job_id,
+        "status_url": f"/api/v1/consul/properties/transfer/jobs/{job_id}"
+    })
\ No newline at end of file
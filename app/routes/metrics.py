@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.concurrency import read_flights
+from app.services.kv_cache import snapshot_cache
+from app.services.metrics import label_set, metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    cache_lines = []
+    for name, value in snapshot_cache.stats().items():
+        metric = f"consul_cache_{name}" if name in ("entries", "bytes") else f"consul_cache_{name}_total"
+        cache_lines.append(f"# TYPE {metric} {'gauge' if name in ('entries', 'bytes') else 'counter'}")
+        cache_lines.append(f"{metric} {value}")
+    cache_lines += [
+        "# HELP consul_coalesced_requests_total Reads that joined an identical in-flight Consul request.",
+        "# TYPE consul_coalesced_requests_total counter",
+    ]
+    for (setup_name, operation), count in sorted(read_flights.coalesced.items()):
+        cache_lines.append(f"consul_coalesced_requests_total{{{label_set(setup=setup_name, operation=operation)}}} {count}")
+    return PlainTextResponse(metrics.render(cache_lines), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -0,0 +1,78 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Body, Query
+from pydantic import BaseModel
+from app.services.health import health_registry
+from app.services.serialization import FastJSONResponse
+from app.services.snapshot_files import compare_with_snapshot, export_snapshot, import_snapshot, list_snapshots, snapshot_path
+
+router = APIRouter()
+
+class SnapshotExportRequest(BaseModel):
+    setup_name: str
+    snapshot_name: str
+    service_name: str = "all"
+
+class SnapshotImportRequest(BaseModel):
+    snapshot_name: str
+    setup_name: str
+    service_name: str = "all"
+
+def requested_services(service_name: str) -> Optional[List[str]]:
+    if service_name.strip().lower() == "all":
+        return None
+    return list(dict.fromkeys(name.strip() for name in service_name.split(',')))
+
+def check_snapshot_name(snapshot_name: str) -> None:
+    try:
+        snapshot_path(snapshot_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error: {e}")
+
+async def check_setup(setup_name: str) -> None:
+    if not await health_registry.is_available(setup_name):
+        raise HTTPException(status_code=404, detail=f"Error: Setup '{setup_name}' is not accessible.")
+
+@router.get("/api/v1/consul/snapshots")
+async def get_snapshots():
+    return {"snapshots": list_snapshots()}
+
+@router.post("/api/v1/consul/snapshots/export")
+async def export_consul_snapshot(request: SnapshotExportRequest = Body(..., example={"setup_name": "setup-name", "snapshot_name": "setup-name-2024-01-01", "service_name": "all"})):
+    check_snapshot_name(request.snapshot_name)
+    await check_setup(request.setup_name)
+    try:
+        result = await export_snapshot(request.setup_name, request.snapshot_name, requested_services(request.service_name))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Error: {e}; snapshot '{request.snapshot_name}' was not written.")
+    return {"message": f"Exported snapshot '{request.snapshot_name}' from '{request.setup_name}'", **result}
+
+@router.post("/api/v1/consul/snapshots/import")
+async def import_consul_snapshot(request: SnapshotImportRequest = Body(..., example={"snapshot_name": "setup-name-2024-01-01", "setup_name": "setup-name", "service_name": "all"})):
+    check_snapshot_name(request.snapshot_name)
+    await check_setup(request.setup_name)
+    try:
+        results = await import_snapshot(request.snapshot_name, request.setup_name, requested_services(request.service_name))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Error: {e}")
+    return {
+        "message": f"Imported snapshot '{request.snapshot_name}' into '{request.setup_name}'",
+        "snapshot_name": request.snapshot_name,
+        "setup_name": request.setup_name,
+        "results": results
+    }
+
+@router.get("/api/v1/consul/snapshots/compare")
+async def compare_consul_snapshot(
+    setup_name: str = Query(..., description="Live setup to compare"),
+    snapshot_name: str = Query(..., description="Snapshot to compare against"),
+    service_name: str = Query("all", description="Comma-separated service names or 'all'")
+):
+    check_snapshot_name(snapshot_name)
+    await check_setup(setup_name)
+    try:
+        results = await compare_with_snapshot(setup_name, snapshot_name, requested_services(service_name))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Error: {e}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Error: {e}")
+    return FastJSONResponse(content={"setup_name": setup_name, "snapshot_name": snapshot_name, "results": results})
\ No newline at end of file
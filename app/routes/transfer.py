@@ -1,38 +1,57 @@
+import asyncio
+from typing import List, Literal, Union
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel
-from app.services.consul_service import ConsulService
+from app.services.health import health_registry
+from app.services.consul_service import ConsulService, summarize_writes
+from app.services.diff import split_diff
+from app.services.kv_cache import decode_properties
+from app.services.metrics import metrics
+from app.services.serialization import FastJSONResponse
 
 router = APIRouter()
 
 class TransferRequest(BaseModel):
     source_setup: str
-    destination_setup: str
+    # One setup, or a list to fan the same source out to several setups.
+    destination_setup: Union[str, List[str]]
     service_name: str
+    # "overwrite" rewrites every source key; "sync" writes only missing or
+    # changed keys and can remove keys that exist only on the destination.
+    mode: Literal["overwrite", "sync"] = "overwrite"
+    delete_extraneous: bool = False
+    dry_run: bool = False
 
 class TransferResponse(BaseModel):
     message: str
     source_setup: str
-    destination_setup: str
+    destination_setup: Union[str, List[str]]
     results: dict
 
-@router.post("/api/v1/consul/properties/transfer")
-async def transfer_consul_properties(request: TransferRequest = Body(..., example={"source_setup": "source_setup-name", "destination_setup": "destination_setup-name", "service_name": "service1-name, service2-name"})):
+@router.post("/api/v1/consul/properties/transfer", response_model=TransferResponse)
+async def transfer_consul_properties(request: TransferRequest = Body(..., example={"source_setup": "source_setup-name", "destination_setup": "destination_setup-name", "service_name": "service1-name, service2-name", "mode": "overwrite", "delete_extraneous": False, "dry_run": False})):
     try:
         source_setup = request.source_setup
-        destination_setup = request.destination_setup
+        fan_out = isinstance(request.destination_setup, list)
+        destination_setups = list(dict.fromkeys(request.destination_setup)) if fan_out else [request.destination_setup]
         service_name_param = request.service_name
 
+        if not destination_setups:
+            raise HTTPException(status_code=400, detail="At least one destination setup is required.")
+
         source_validator = ConsulService(source_setup, "")
-        if not source_validator.validate_setup():
+        available = await asyncio.gather(*(health_registry.is_available(setup) for setup in [source_setup] + destination_setups))
+        if not available[0]:
             raise HTTPException(status_code=404, detail=f"Error: Source setup '{source_setup}' is not accessible.")
 
-        dest_validator = ConsulService(destination_setup, "")
-        if not dest_validator.validate_setup():
-            raise HTTPException(status_code=404, detail=f"Error: Destination setup '{destination_setup}' is not accessible.")
+        unavailable = [setup for setup, ok in zip(destination_setups, available[1:]) if not ok]
+        if len(unavailable) == 1:
+            raise HTTPException(status_code=404, detail=f"Error: Destination setup '{unavailable[0]}' is not accessible.")
+        if unavailable:
+            raise HTTPException(status_code=404, detail=f"Error: Destination setups not accessible: {', '.join(unavailable)}")
 
-        source_services = source_validator.get_available_services()
+        source_services = await source_validator.get_available_services()
         service_names = [name.strip() for name in service_name_param.split(',')]
-        results = {}
         invalid_services = []
 
         for service_name in service_names:
@@ -42,32 +61,95 @@ async def transfer_consul_properties(request: TransferRequest = Body(..., exampl
         if invalid_services:
             raise HTTPException(status_code=404, detail=f"Error: Services not found in source setup: {', '.join(invalid_services)}")
 
-        for service_name in service_names:
-            source_consul = ConsulService(source_setup, service_name)
-            all_properties = source_consul.get_all_keys()
+        # The source is read once per service and shared by every destination;
+        # writes to each destination are bounded by that setup's own limit.
+        fetched = await asyncio.gather(*(ConsulService(source_setup, name).get_encoded_keys() for name in service_names))
+        source_by_service = dict(zip(service_names, fetched))
+        decoded_by_service = {}
+
+        def decoded(service_name: str) -> dict:
+            if service_name not in decoded_by_service:
+                decoded_by_service[service_name] = decode_properties(source_by_service[service_name])
+            return decoded_by_service[service_name]
+
+        async def transfer_service(destination_setup: str, service_name: str) -> dict:
+            all_properties = source_by_service[service_name]
 
             if not all_properties:
-                results[service_name] = {
+                return {
                     "status": "error",
                     "message": f"No properties found in source setup for this service"
                 }
-                continue
 
+            if request.dry_run:
+                return {
+                    "status": "dry_run",
+                    "properties": decoded(service_name)
+                }
+
+            destination_consul = ConsulService(destination_setup, service_name)
+            key_results = await destination_consul.apply_changes(all_properties, [], encoded=True)
+
+            return {
+                **summarize_writes(key_results),
+                "properties": decoded(service_name)
+            }
+
+        async def sync_service(destination_setup: str, service_name: str) -> dict:
             destination_consul = ConsulService(destination_setup, service_name)
+            # Compared and copied base64-encoded; sync results list keys only.
+            source_properties = source_by_service[service_name]
+
+            if not source_properties:
+                return {
+                    "status": "error",
+                    "message": f"No properties found in source setup for this service"
+                }
 
-            for key, value in all_properties.items():
-                destination_consul.set_key_value(key, value)
+            dest_properties = await destination_consul.get_encoded_keys()
+            with metrics.phase("diff"):
+                missing, extraneous, changed = split_diff(source_properties, dest_properties)
+            to_write = {key: source_properties[key] for key in sorted(missing | changed)}
+            to_delete = sorted(extraneous) if request.delete_extraneous else []
+            skipped = len(source_properties) - len(to_write)
 
-            results[service_name] = {
-                "status": "success",
-                "properties": all_properties
+            if request.dry_run:
+                return {
+                    "status": "dry_run",
+                    "written": len(to_write),
+                    "deleted": len(to_delete),
+                    "skipped": skipped,
+                    "keys_to_write": list(to_write),
+                    "keys_to_delete": to_delete
+                }
+
+            key_results = await destination_consul.apply_changes(to_write, to_delete, encoded=True) if to_write or to_delete else {}
+
+            return {
+                **summarize_writes(key_results),
+                "written": sum(1 for key in to_write if key_results.get(key)),
+                "deleted": sum(1 for key in to_delete if key_results.get(key)),
+                "skipped": skipped,
+                "keys_written": list(to_write),
+                "keys_deleted": to_delete
             }
 
-        return TransferResponse(
-            message=f"Transferred properties from '{source_setup}' to '{destination_setup}'",
-            source_setup=source_setup,
-            destination_setup=destination_setup,
-            results=results
-        )
+        run_service = sync_service if request.mode == "sync" else transfer_service
+        pairs = [(destination, service_name) for destination in destination_setups for service_name in service_names]
+        outcomes = await asyncio.gather(*(run_service(destination, service_name) for destination, service_name in pairs))
+        results_by_destination = {destination: {} for destination in destination_setups}
+        for (destination, service_name), outcome in zip(pairs, outcomes):
+            results_by_destination[destination][service_name] = outcome
+
+        destination_label = ", ".join(f"'{destination}'" for destination in destination_setups)
+        # Returned directly: TransferResponse documents the shape but is not
+        # re-validated over potentially multi-MB results.
+        with metrics.phase("serialize"):
+            return FastJSONResponse(content={
+                "message": f"{'Planned transfer of' if request.dry_run else 'Transferred'} properties from '{source_setup}' to {destination_label}",
+                "source_setup": source_setup,
+                "destination_setup": destination_setups if fan_out else destination_setups[0],
+                "results": results_by_destination if fan_out else results_by_destination[destination_setups[0]]
+            })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error transferring Consul properties: {str(e)}")
\ No newline at end of file
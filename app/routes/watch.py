@@ -0,0 +1,60 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app import config
+from app.services.consul_service import ConsulService
+from app.services.health import health_registry
+from app.services.serialization import dumps
+from app.services.watch import watch_hub
+
+router = APIRouter()
+
+@router.get("/api/v1/consul/properties/watch")
+async def watch_consul_properties(
+    setup_name: str = Query(..., description="Setup to watch"),
+    service_name: str = Query(..., description="Comma-separated service names")
+):
+    if service_name.strip().lower() == "all":
+        raise HTTPException(status_code=400, detail="Watching 'all' is not supported; list the services to watch.")
+
+    if not await health_registry.is_available(setup_name):
+        raise HTTPException(status_code=404, detail=f"Error: Setup '{setup_name}' is not accessible.")
+
+    available_services = await ConsulService(setup_name, "").get_available_services()
+    service_names = list(dict.fromkeys(name.strip() for name in service_name.split(',')))
+    invalid_services = [name for name in service_names if name not in available_services]
+    if invalid_services:
+        raise HTTPException(status_code=404, detail=f"Error: Services not found in setup '{setup_name}': {', '.join(invalid_services)}")
+
+    # Subscribed before the response starts so the limit is enforced here;
+    # the stream's finally releases the watches when the client leaves.
+    queue = asyncio.Queue()
+    if not watch_hub.subscribe_many(setup_name, service_names, queue):
+        raise HTTPException(status_code=503, detail=f"Error: Too many active watches (limit {watch_hub.max_watches}); try again later.")
+
+    async def events():
+        # Each service first sends a "snapshot" event with all its properties,
+        # then "change" events with only the keys that were added, changed or
+        # removed.
+        # The pending get is kept across heartbeats and awaited with
+        # asyncio.wait: wait_for can swallow the cancellation sent when the
+        # client disconnects, which would keep its watches alive.
+        get = None
+        try:
+            while True:
+                if get is None:
+                    get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get}, timeout=config.WATCH_HEARTBEAT)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                event, payload = get.result()
+                get = None
+                yield b"event: %s\ndata: %s\n\n" % (event.encode("utf-8"), dumps(payload))
+        finally:
+            if get is not None:
+                get.cancel()
+            for name in service_names:
+                watch_hub.unsubscribe(setup_name, name, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
\ No newline at end of file
@@ -0,0 +1,46 @@
+import time
+from typing import Dict, Optional
+from app import config
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures. While open, one trial
+    # request is let through every `reset_timeout` seconds; its success
+    # closes the circuit again.
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        return "closed" if self.opened_at is None else "open"
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            self.opened_at = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def setup_breaker(setup_name: str) -> CircuitBreaker:
+    breaker = _breakers.get(setup_name)
+    if breaker is None:
+        breaker = _breakers[setup_name] = CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT)
+    return breaker
\ No newline at end of file
@@ -0,0 +1,153 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# brotli is optional; without it only gzip is offered.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Event streams are left alone so every event and heartbeat reaches the client
+# as soon as it is sent.
+UNCOMPRESSED_TYPES = (b"text/event-stream",)
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    # Maps each coding in an Accept-Encoding header to its quality (1 when
+    # no q= is given); entries with an unreadable quality are ignored.
+    qualities = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = None
+        if name.strip() and quality is not None:
+            qualities[name.strip().lower()] = quality
+    return qualities
+
+def merge_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    # Adds Accept-Encoding to an existing Vary header instead of sending a
+    # second one.
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            fields = [field.strip().lower() for field in value.split(b",")]
+            if b"*" not in fields and b"accept-encoding" not in fields:
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._gzip.compress(data)
+
+    def flush(self) -> bytes:
+        # Emits everything compressed so far without ending the stream, so each
+        # NDJSON line can be decoded by the client as soon as it arrives.
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+class CompressionMiddleware:
+    # Plain ASGI middleware: compresses with brotli (when installed) or gzip,
+    # whichever the client accepts. Whole bodies under minimum_size are sent
+    # as-is; streamed bodies are compressed chunk by chunk.
+    def __init__(self, app, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, scope) -> Optional[str]:
+        # The supported coding with the highest quality wins, with "*"
+        # standing for any coding not listed; brotli is preferred on a tie.
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                qualities = accepted_encodings(value.decode("latin-1"))
+                supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+                quality = lambda encoding: qualities.get(encoding, qualities.get("*", 0.0))
+                best = max(supported, key=quality)
+                return best if quality(best) > 0 else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._choose(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        def compressed_headers(headers: List[Tuple[bytes, bytes]], length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+            headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers = merge_vary(headers)
+            if length is not None:
+                headers.append((b"content-length", str(length).encode("latin-1")))
+            return headers
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = dict((name.lower(), value) for name, value in message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                passthrough = b"content-encoding" in headers or content_type.startswith(UNCOMPRESSED_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None and start_message is not None:
+                if not more_body:
+                    # The whole body in one message: compress it in one go
+                    # and send an exact content-length.
+                    if len(body) < self.minimum_size:
+                        await send(start_message)
+                    else:
+                        whole = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                        body = whole.compress(body) + whole.finish()
+                        await send({**start_message, "headers": compressed_headers(start_message.get("headers", []), len(body))})
+                    start_message = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                await send({**start_message, "headers": compressed_headers(start_message.get("headers", []), None)})
+                start_message = None
+
+            if compressor is None:
+                await send(message)
+                return
+
+            chunk = compressor.compress(body) + (compressor.flush() if more_body else compressor.finish())
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
\ No newline at end of file
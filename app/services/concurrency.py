@@ -0,0 +1,91 @@
+import asyncio
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Tuple, Union
+from app import config
+
+# A semaphore binds to the event loop that first waits on it, so each loop
+# (a second lifespan, a reload, a test client) gets its own set. Sets of
+# loops that have since closed are dropped when a new loop shows up.
+_semaphores: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]] = {}
+
+def loop_registry(registries: Dict[asyncio.AbstractEventLoop, Dict[str, Any]]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    registry = registries.get(loop)
+    if registry is None:
+        for closed in [other for other in registries if other.is_closed()]:
+            del registries[closed]
+        registry = registries[loop] = {}
+    return registry
+
+def setup_limit(setup_name: str) -> int:
+    return config.CONSUL_SETUP_CONCURRENCY_OVERRIDES.get(setup_name, config.CONSUL_SETUP_CONCURRENCY)
+
+def setup_semaphore(setup_name: str) -> asyncio.Semaphore:
+    semaphores = loop_registry(_semaphores)
+    semaphore = semaphores.get(setup_name)
+    if semaphore is None:
+        semaphore = semaphores[setup_name] = asyncio.Semaphore(setup_limit(setup_name))
+    return semaphore
+
+async def _as_async(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+async def ordered_prefetch(items: Union[Iterable[Any], AsyncIterable[Any]], fetch: Callable[[Any], Awaitable[Any]], window: int) -> AsyncIterator[Tuple[Any, Any]]:
+    # Yields (item, result) in input order while keeping at most `window`
+    # fetches in flight, so only a few results are held in memory at once.
+    # `items` may be produced lazily, e.g. read line by line from a file.
+    if not hasattr(items, "__aiter__"):
+        items = _as_async(items)
+    pending = deque()
+    try:
+        async for item in items:
+            pending.append((item, asyncio.ensure_future(fetch(item))))
+            if len(pending) >= window:
+                item, task = pending.popleft()
+                yield item, await task
+        while pending:
+            item, task = pending.popleft()
+            yield item, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+@dataclass
+class Flight:
+    task: asyncio.Future
+    waiters: int = 0
+
+class SingleFlight:
+    # Concurrent calls with the same key share one in-flight fetch. Each
+    # caller awaits it through a shield, so a caller that gives up does not
+    # cancel the fetch for the others; the fetch is cancelled only once every
+    # caller has given up. `coalesced` counts the callers that joined an
+    # existing fetch, per label.
+    def __init__(self):
+        self._calls: Dict[Hashable, Flight] = {}
+        self.coalesced: Dict[Hashable, int] = defaultdict(int)
+
+    async def do(self, key: Hashable, label: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = Flight(asyncio.ensure_future(fetch()))
+            flight.task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced[label] += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._forget(key, flight.task)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        flight = self._calls.get(key)
+        if flight is not None and flight.task is task:
+            del self._calls[key]
+
+read_flights = SingleFlight()
\ No newline at end of file
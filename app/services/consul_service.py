@@ -1,31 +1,220 @@
-from typing import Dict, List, Any
-import requests
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional
+import asyncio
+import random
+import time
+from contextlib import nullcontext
+import httpx
 import base64
 from fastapi import HTTPException
+from app import config
+from app.services.kv_cache import Snapshot, snapshot_cache, snapshot_properties
+from app.services.circuit_breaker import CircuitOpenError, setup_breaker
+from app.services.concurrency import read_flights, setup_semaphore
+from app.services.json_stream import iter_json_array
+from app.services.metrics import metrics
+
+# One pooled client shared by every ConsulService instance so connections and
+# TLS sessions to each setup are reused across requests. Blocking queries get
+# a second client with its own connection cap: each holds a connection for
+# up to WATCH_WAIT seconds and would otherwise starve ordinary reads. Both are
+# opened and closed by the app lifespan in app/main.py.
+_client: Optional[httpx.AsyncClient] = None
+_watch_client: Optional[httpx.AsyncClient] = None
+
+async def open_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    global _client, _watch_client
+    timeout = httpx.Timeout(config.CONSUL_READ_TIMEOUT, connect=config.CONSUL_CONNECT_TIMEOUT)
+    if _client is None:
+        limits = httpx.Limits(
+            max_connections=config.CONSUL_MAX_CONNECTIONS,
+            max_keepalive_connections=config.CONSUL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.CONSUL_KEEPALIVE_EXPIRY,
+        )
+        _client = httpx.AsyncClient(limits=limits, transport=transport, timeout=timeout)
+    if _watch_client is None:
+        limits = httpx.Limits(
+            max_connections=config.WATCH_MAX_CONNECTIONS,
+            max_keepalive_connections=config.WATCH_MAX_CONNECTIONS,
+            keepalive_expiry=config.CONSUL_KEEPALIVE_EXPIRY,
+        )
+        _watch_client = httpx.AsyncClient(limits=limits, transport=transport, timeout=timeout)
+    return _client
+
+async def close_client() -> None:
+    global _client, _watch_client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _watch_client is not None:
+        await _watch_client.aclose()
+        _watch_client = None
+
+def get_client(blocking: bool = False) -> httpx.AsyncClient:
+    client = _watch_client if blocking else _client
+    if client is None:
+        raise RuntimeError("Consul HTTP client is not open; call open_client() first")
+    return client
+
+# Consumes the items of a ?recurse=true listing as they are parsed.
+ItemParser = Callable[[AsyncIterator[Dict[str, Any]]], Awaitable[Any]]
+
+# Responses worth retrying or hedging: Consul or its load balancer is
+# overloaded, restarting or between leaders.
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(config.CONSUL_RETRY_BACKOFF_MAX, config.CONSUL_RETRY_BACKOFF * 2 ** attempt))
+
+def summarize_writes(key_results: Dict[str, bool]) -> Dict[str, Any]:
+    failed_keys = [key for key, ok in key_results.items() if not ok]
+    if not failed_keys:
+        return {"status": "success"}
+    return {
+        "status": "error" if len(failed_keys) == len(key_results) else "partial",
+        "message": f"Failed to write {len(failed_keys)} of {len(key_results)} keys",
+        "failed_keys": failed_keys
+    }
 
 class ConsulService:
-    def __init__(self, setup_name: str, service_name: str):
+    def __init__(self, setup_name: str, service_name: str, use_cache: bool = True):
         self.setup_name = setup_name
         self.service_name = service_name
-        self.base_url = f'https://{setup_name}-consul.greymatter.greyorange.com/v1/kv/config/{service_name}'
+        self.use_cache = use_cache
+        self.consul_url = config.CONSUL_URL_TEMPLATE.format(setup=setup_name).rstrip('/')
+        self.kv_url = f'{self.consul_url}/v1/kv/'
+        self.base_url = f'{self.consul_url}/v1/kv/config/{service_name}'
+        self.txn_url = f'{self.consul_url}/v1/txn'
         self.headers = {'Content-Type': 'application/json'}
 
-    def validate_setup(self) -> bool:
+    async def _request(self, method: str, url: str, operation: str, blocking: bool = False, retries: Optional[int] = None, parse: Optional[ItemParser] = None, **kwargs) -> httpx.Response:
+        # Identical reads already in flight are joined rather than repeated;
+        # the URL carries the setup, the path and every query parameter.
+        # Blocking queries are already shared per (setup, service) by the
+        # watch hub and are left out.
+        if method == 'GET' and not blocking:
+            return await read_flights.do(url, (metrics.setup_label(self.setup_name), operation), lambda: self._attempts(method, url, operation, blocking, retries, parse, **kwargs))
+        return await self._attempts(method, url, operation, blocking, retries, parse, **kwargs)
+
+    async def _attempts(self, method: str, url: str, operation: str, blocking: bool, retries: Optional[int], parse: Optional[ItemParser], **kwargs) -> httpx.Response:
+        breaker = setup_breaker(self.setup_name)
+        reads = method == 'GET'
+        attempts = 1 + (config.CONSUL_READ_RETRIES if retries is None else retries) if reads else 1
+        # A blocking query is slow by design; hedging it would only hold a
+        # second watch connection for the whole wait.
+        send = self._send_hedged if reads and not blocking and config.CONSUL_HEDGE_DELAY > 0 else self._send
+
+        # The breaker is consulted once and told one outcome per logical
+        # request, so retries neither open the circuit early nor hide the real
+        # upstream error behind CircuitOpenError.
+        if not breaker.allow():
+            metrics.record_upstream(self.setup_name, operation, 'circuit_open', 0.0, 0, 0)
+            raise CircuitOpenError(f"Circuit open for setup '{self.setup_name}'")
+
+        for attempt in range(attempts):
+            try:
+                response = await send(method, url, operation, blocking, parse=parse, **kwargs)
+            except Exception as e:
+                if not isinstance(e, httpx.TransportError) or attempt == attempts - 1:
+                    breaker.record_failure()
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    return response
+                if attempt == attempts - 1:
+                    breaker.record_failure()
+                    return response
+            await asyncio.sleep(retry_delay(attempt))
+
+    async def _send(self, method: str, url: str, operation: str, blocking: bool, parse: Optional[ItemParser] = None, **kwargs) -> httpx.Response:
+        # Blocking queries sit idle upstream for minutes: they go through the
+        # watch client and do not hold one of the setup's concurrency slots.
+        async with nullcontext() if blocking else setup_semaphore(self.setup_name):
+            client = get_client(blocking)
+            start = time.perf_counter()
+            try:
+                if parse is None:
+                    response = await client.request(method, url, headers=self.headers, **kwargs)
+                    response.received_bytes = len(response.content)
+                else:
+                    response = await client.send(client.build_request(method, url, headers=self.headers, **kwargs), stream=True)
+                    try:
+                        await self._consume(response, parse)
+                    finally:
+                        await response.aclose()
+            except Exception as e:
+                metrics.record_upstream(self.setup_name, operation, type(e).__name__, time.perf_counter() - start, 0, 0)
+                raise
+            metrics.record_upstream(self.setup_name, operation, str(response.status_code), time.perf_counter() - start, len(response.request.content), response.received_bytes)
+            return response
+
+    @staticmethod
+    async def _consume(response: httpx.Response, parse: ItemParser) -> None:
+        # A successful streamed body is parsed item by item as it arrives and
+        # the result left on response.parsed; anything else is read whole so
+        # callers can report response.text.
+        response.received_bytes = 0
+        if response.status_code != 200:
+            await response.aread()
+            response.received_bytes = len(response.content)
+            return
+
+        async def chunks() -> AsyncIterator[bytes]:
+            async for chunk in response.aiter_bytes():
+                response.received_bytes += len(chunk)
+                yield chunk
+
+        response.parsed = await parse(iter_json_array(chunks()))
+
+    async def _send_hedged(self, method: str, url: str, operation: str, blocking: bool, **kwargs) -> httpx.Response:
+        # A second copy of a slow read goes out on another pooled connection,
+        # which a load balancer in front of the setup usually routes to a
+        # different server; the first good answer wins.
+        tasks = [asyncio.ensure_future(self._send(method, url, operation, blocking, **kwargs))]
         try:
-            url = f"https://{self.setup_name}-consul.greymatter.greyorange.com/ui/dc1/kv"
-            response = requests.get(url, headers=self.headers, timeout=5)
-            return response.status_code == 200
+            done, _ = await asyncio.wait(tasks, timeout=config.CONSUL_HEDGE_DELAY)
+            if not done:
+                tasks.append(asyncio.ensure_future(self._send(method, url, f"{operation}_hedge", blocking, **kwargs)))
+
+            pending = set(tasks)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                        return task.result()
+            return last.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def validate_setup(self) -> bool:
+        # /v1/status/leader is a tiny, unauthenticated response; an empty
+        # leader means the cluster is up but cannot serve consistent reads.
+        try:
+            url = f"{self.consul_url}/v1/status/leader"
+            response = await self._request('GET', url, 'status_leader', retries=0, timeout=config.HEALTH_PROBE_TIMEOUT)
+            return response.status_code == 200 and response.text.strip() not in ('', '""')
         except Exception:
             return False
             
-    def get_available_services(self) -> List[str]:
+    async def get_available_services(self) -> List[str]:
+        return await self.list_services() or []
+
+    async def list_services(self) -> Optional[List[str]]:
+        # None when the listing could not be read, as opposed to a setup that
+        # has no services.
         try:
-            url = f'https://{self.setup_name}-consul.greymatter.greyorange.com/v1/kv/config/?keys=true'
-            response = requests.get(url, headers=self.headers)
+            url = f'{self.kv_url}config/?keys=true'
+            response = await self._request('GET', url, 'list_services')
+            if response.status_code == 404:
+                return []
             
             if response.status_code != 200:
                 print(f"Error fetching services: {response.text}")
-                return []
+                return None
             
             services = []
             for key in response.json():
@@ -38,37 +227,179 @@ class ConsulService:
             return services
         except Exception as e:
             print(f"Error retrieving services for {self.setup_name}: {e}")
-            return []
+            return None
 
-    def get_all_keys(self) -> Dict[str, str]:
-        try:
-            url = f"{self.base_url}?recurse=true"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code != 200:
-                print(f"Error fetching keys: {response.text}")
-                return {}
-            
-            results = {}
-            for item in response.json():
-                key = item['Key'].split('/')[-1]
-                value = base64.b64decode(item['Value']).decode('utf-8') if item.get('Value') else ''
-                # print(f"key : {key} ,  value : {value}")
-                if not key.strip(): #if not then returns empty key val pair as first property while fetching 
-                    continue
-                
-                results[key] = value
+    async def _current_index(self, prefix: str) -> Optional[str]:
+        # A keys-only listing cut at the first separator is a few bytes, but its
+        # X-Consul-Index still covers every key under the prefix.
+        url = f"{self.kv_url}{prefix}?keys=true&separator=/"
+        response = await self._request('GET', url, 'revalidate')
+        if response.status_code not in [200, 404]:
+            return None
+        return response.headers.get('X-Consul-Index')
+
+    async def _read_snapshot(self, prefix: str, parse: ItemParser) -> Optional[Snapshot]:
+        if self.use_cache:
+            cached = snapshot_cache.get(self.setup_name, prefix)
+            if cached is not None and await self._current_index(prefix) == cached.index:
+                snapshot_cache.hits += 1
+                cached.from_cache = True
+                return cached
+            snapshot_cache.misses += 1
+
+        response = await self._request('GET', f"{self.kv_url}{prefix}?recurse=true", 'read_tree', parse=parse)
+        if response.status_code != 200:
+            print(f"Error fetching keys: {response.text}")
+            return None
+
+        snapshot = Snapshot(response.headers.get('X-Consul-Index', ''), response.parsed, response.received_bytes)
+        if snapshot.index:
+            snapshot_cache.put(self.setup_name, prefix, snapshot)
+        return snapshot
+
+    @staticmethod
+    async def _parse_service(items: AsyncIterator[Dict[str, Any]]) -> Dict[str, str]:
+        results = {}
+        async for item in items:
+            key = item['Key'].split('/')[-1]
+            # print(f"key : {key} ,  value : {value}")
+            if not key.strip(): #if not then returns empty key val pair as first property while fetching 
+                continue
             
-            return results
+            results[key] = item.get('Value') or ''
+        
+        return results
+
+    @staticmethod
+    async def _parse_all_services(items: AsyncIterator[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+        # Services that only exist as an empty folder are kept with no
+        # properties so the result doubles as the service listing.
+        results = {}
+        async for item in items:
+            parts = item['Key'].split('/')
+            if len(parts) < 2 or parts[0] != 'config' or not parts[1]:
+                continue
+
+            properties = results.setdefault(parts[1], {})
+            key = parts[-1]
+            if not key.strip():
+                continue
+
+            properties[key] = item.get('Value') or ''
+
+        return results
+
+    async def get_service_snapshot(self) -> Optional[Snapshot]:
+        try:
+            # The trailing slash keeps sibling services that share this name
+            # as a prefix (svc, svc-api) out of the read.
+            return await self._read_snapshot(f"config/{self.service_name}/", self._parse_service)
         except Exception as e:
             print(f"Error retrieving keys for {self.service_name} in {self.setup_name}: {e}")
+            return None
+
+    async def get_all_services_snapshot(self) -> Optional[Snapshot]:
+        # One recursive read of config/ split into per-service maps.
+        try:
+            return await self._read_snapshot("config/", self._parse_all_services)
+        except Exception as e:
+            print(f"Error retrieving keys for all services in {self.setup_name}: {e}")
+            return None
+
+    async def watch_service(self, index: Optional[str], wait: float) -> Optional[Snapshot]:
+        # Consul holds the request until something under the prefix changes
+        # past `index` or `wait` elapses; index 0 returns immediately.
+        url = f"{self.kv_url}config/{self.service_name}/?recurse=true&index={index or 0}&wait={int(wait)}s"
+        response = await self._request('GET', url, 'watch', blocking=True, retries=0, parse=self._parse_service, timeout=httpx.Timeout(wait + wait / 16 + 5, connect=config.CONSUL_CONNECT_TIMEOUT))
+        if response.status_code == 404:
+            return Snapshot(response.headers.get('X-Consul-Index', ''), {}, 0)
+        if response.status_code != 200:
+            print(f"Error watching {self.service_name} in {self.setup_name}: {response.text}")
+            return None
+        return Snapshot(response.headers.get('X-Consul-Index', ''), response.parsed, response.received_bytes)
+
+    async def get_all_keys(self) -> Dict[str, str]:
+        snapshot = await self.get_service_snapshot()
+        return snapshot_properties(snapshot) if snapshot else {}
+
+    async def get_encoded_keys(self) -> Dict[str, str]:
+        # Values as Consul returned them (base64), for callers that only
+        # compare or copy them.
+        snapshot = await self.get_service_snapshot()
+        return snapshot.data if snapshot else {}
+
+    async def get_all_services_keys(self) -> Dict[str, Dict[str, str]]:
+        snapshot = await self.get_all_services_snapshot()
+        if not snapshot:
             return {}
+        return {service: snapshot_properties(snapshot, service) for service in snapshot.data}
 
-    def set_key_value(self, key: str, value: Any) -> bool:
+    async def set_key_value(self, key: str, value: Any) -> bool:
         try:
             url = f"{self.base_url}/{key}"
-            response = requests.put(url, headers=self.headers, data=str(value))
+            response = await self._request('PUT', url, 'put_key', content=str(value))
             return response.status_code in [200, 204]
         except Exception as e:
             print(f"Error setting key-value for {self.service_name} in {self.setup_name}: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def _txn_batches(self, ops: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # Consul rejects transactions above txn_max_req_len bytes or with more
+        # than its per-transaction operation limit, so split on both.
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for op in ops:
+            op_bytes = len(op['KV']['Key']) + len(op['KV'].get('Value', '')) + 64
+            if batch and (len(batch) >= config.CONSUL_TXN_MAX_OPS or batch_bytes + op_bytes > config.CONSUL_TXN_MAX_BYTES):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(op)
+            batch_bytes += op_bytes
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def run_txn(self, ops: List[Dict[str, Any]]) -> bool:
+        try:
+            response = await self._request('PUT', self.txn_url, 'txn', json=ops)
+            if response.status_code != 200:
+                print(f"Error applying transaction for {self.service_name} in {self.setup_name}: {response.text}")
+                return False
+            return True
+        except Exception as e:
+            print(f"Error applying transaction for {self.service_name} in {self.setup_name}: {e}")
+            return False
+
+    def plan_batches(self, properties: Dict[str, Any], deletions: List[str], encoded: bool = False) -> List[List[Dict[str, Any]]]:
+        # encoded=True takes values already base64-encoded, as read by
+        # get_encoded_keys(), and copies them without decoding.
+        prefix = f"config/{self.service_name}/"
+        ops = []
+        for key, value in properties.items():
+            ops.append({
+                'KV': {
+                    'Verb': 'set',
+                    'Key': f"{prefix}{key}",
+                    'Value': value if encoded else base64.b64encode(str(value).encode('utf-8')).decode('ascii'),
+                }
+            })
+        for key in deletions:
+            ops.append({'KV': {'Verb': 'delete', 'Key': f"{prefix}{key}"}})
+        return self._txn_batches(ops)
+
+    async def apply_changes(self, properties: Dict[str, Any], deletions: List[str], encoded: bool = False) -> Dict[str, bool]:
+        prefix = f"config/{self.service_name}/"
+        batches = self.plan_batches(properties, deletions, encoded)
+        outcomes = await asyncio.gather(*(self.run_txn(batch) for batch in batches))
+
+        results = {}
+        for batch, ok in zip(batches, outcomes):
+            # Each batch is applied atomically, so every key in it shares the outcome.
+            for op in batch:
+                results[op['KV']['Key'][len(prefix):]] = ok
+        return results
+
+    async def set_key_values(self, properties: Dict[str, Any]) -> Dict[str, bool]:
+        return await self.apply_changes(properties, [])
\ No newline at end of file
@@ -0,0 +1,126 @@
+import hashlib
+from typing import Callable, Dict, Any, Optional, Set, Tuple
+from app.services.kv_cache import Snapshot, decode_value
+
+def properties_digest(properties: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for key in sorted(properties):
+        digest.update(key.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(properties[key].encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def snapshot_digest(snapshot: Snapshot, service_name: str = "") -> str:
+    digest = snapshot.digests.get(service_name)
+    if digest is None:
+        properties = snapshot.data.get(service_name, {}) if service_name else snapshot.data
+        digest = snapshot.digests[service_name] = properties_digest(properties)
+    return digest
+
+def split_diff(properties_1: Dict[str, str], properties_2: Dict[str, str]) -> Tuple[Set[str], Set[str], Set[str]]:
+    # Returns (keys only in 1, keys only in 2, common keys whose values differ).
+    keys_1 = set(properties_1.keys())
+    keys_2 = set(properties_2.keys())
+    changed = {key for key in keys_1 & keys_2 if properties_1[key] != properties_2[key]}
+    return keys_1 - keys_2, keys_2 - keys_1, changed
+
+def _unchanged(value: str) -> str:
+    return value
+
+def diff_properties(service_name: str, properties_1: Dict[str, str], properties_2: Dict[str, str], source_setup: str, destination_setup: str, decode: Callable[[str], str] = _unchanged) -> Dict[str, Any]:
+    # `decode` is applied to reported values only, so encoded properties can
+    # be compared as-is and just the differing values decoded.
+    if not properties_1 and not properties_2:
+        return {
+            "status": "error",
+            "message": f"Service '{service_name}' does not exist in either setup"
+        }
+    
+    if not properties_1:
+        properties_1 = {}
+    if not properties_2:
+        properties_2 = {}
+
+    only_1, only_2, changed = split_diff(properties_1, properties_2)
+
+    source_exclusive = {key: decode(properties_1[key]) for key in only_1}
+    destination_exclusive = {key: decode(properties_2[key]) for key in only_2}
+    different_values = {
+        key: {
+            f"{source_setup}": decode(properties_1[key]),
+            f"{destination_setup}": decode(properties_2[key])
+        }
+        for key in changed
+    }
+    
+    return {
+        f"exclusive_to_{source_setup}": source_exclusive,
+        f"exclusive_to_{destination_setup}": destination_exclusive,
+        "common_keys_with_different_values": different_values
+    }
+
+def identical_result(source_setup: str, destination_setup: str) -> Dict[str, Any]:
+    return {
+        f"exclusive_to_{source_setup}": {},
+        f"exclusive_to_{destination_setup}": {},
+        "common_keys_with_different_values": {}
+    }
+
+def diff_snapshots(service_name: str, snapshot_1: Optional[Snapshot], snapshot_2: Optional[Snapshot], source_setup: str, destination_setup: str, service_key: str = "") -> Dict[str, Any]:
+    # service_key selects one service out of an all-services snapshot.
+    def properties(snapshot: Optional[Snapshot]) -> Dict[str, str]:
+        if snapshot is None:
+            return {}
+        return snapshot.data.get(service_key, {}) if service_key else snapshot.data
+
+    properties_1 = properties(snapshot_1)
+    properties_2 = properties(snapshot_2)
+
+    # Snapshots reused from the cache keep their digests between requests, so
+    # repeated compares of unchanged services skip the values. Fresh reads are
+    # compared directly: hashing them first costs more than the comparison.
+    if properties_1 and properties_2:
+        if snapshot_1.from_cache and snapshot_2.from_cache:
+            identical = snapshot_digest(snapshot_1, service_key) == snapshot_digest(snapshot_2, service_key)
+        else:
+            identical = properties_1 == properties_2
+        if identical:
+            return identical_result(source_setup, destination_setup)
+
+    return diff_properties(service_name, properties_1, properties_2, source_setup, destination_setup, decode_value)
+
+def diff_matrix(service_name: str, properties_by_setup: Dict[str, Dict[str, str]], baseline: str, decode: Callable[[str], str] = _unchanged) -> Dict[str, Any]:
+    # One pass over the union of keys, comparing every setup to the baseline
+    # rather than to each other. A missing key is reported as null.
+    if not any(properties_by_setup.values()):
+        return {
+            "status": "error",
+            "message": f"Service '{service_name}' does not exist in any setup"
+        }
+
+    baseline_properties = properties_by_setup[baseline]
+    others = [setup for setup in properties_by_setup if setup != baseline]
+    all_keys = set(baseline_properties)
+    for setup in others:
+        all_keys.update(properties_by_setup[setup])
+
+    keys = {}
+    differing_keys = {setup: 0 for setup in others}
+    for key in sorted(all_keys):
+        expected = baseline_properties.get(key)
+        differs = [setup for setup in others if properties_by_setup[setup].get(key) != expected]
+        if not differs:
+            continue
+        for setup in differs:
+            differing_keys[setup] += 1
+        keys[key] = {
+            "values": {setup: decode(properties[key]) if key in properties else None for setup, properties in properties_by_setup.items()},
+            "differs_from_baseline": differs
+        }
+
+    return {
+        "differing_keys": differing_keys,
+        "identical_setups": [setup for setup in others if not differing_keys[setup]],
+        "keys": keys
+    }
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+from app import config
+from app.services.circuit_breaker import setup_breaker
+from app.services.concurrency import loop_registry
+from app.services.consul_service import ConsulService
+
+@dataclass
+class SetupHealth:
+    healthy: bool
+    checked_at: float
+    last_used: float
+
+class HealthRegistry:
+    def __init__(self, ttl: float, probe_interval: float, idle_expiry: float):
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.idle_expiry = idle_expiry
+        self._setups: Dict[str, SetupHealth] = {}
+        # Probe tasks belong to the loop that started them, so they are kept
+        # per loop and a request never awaits another loop's future.
+        self._probes: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def is_available(self, setup_name: str) -> bool:
+        health = self._setups.get(setup_name)
+        now = time.monotonic()
+        if health is not None and now - health.checked_at < self.ttl:
+            health.last_used = now
+            return health.healthy
+        return await self.refresh(setup_name)
+
+    async def refresh(self, setup_name: str) -> bool:
+        # Requests arriving while a probe for the same setup is running wait
+        # for that probe instead of starting their own.
+        probes = loop_registry(self._probes)
+        task = probes.get(setup_name)
+        if task is None:
+            task = probes[setup_name] = asyncio.ensure_future(self._probe(setup_name))
+            task.add_done_callback(lambda _: probes.pop(setup_name, None))
+        return await asyncio.shield(task)
+
+    async def _probe(self, setup_name: str) -> bool:
+        healthy = await ConsulService(setup_name, "").validate_setup()
+        now = time.monotonic()
+        previous = self._setups.get(setup_name)
+        self._setups[setup_name] = SetupHealth(healthy, now, previous.last_used if previous else now)
+        return healthy
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            now = time.monotonic()
+            for setup_name in [name for name, health in self._setups.items() if now - health.last_used > self.idle_expiry]:
+                del self._setups[setup_name]
+            await asyncio.gather(*(self.refresh(setup_name) for setup_name in list(self._setups)), return_exceptions=True)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        return {
+            setup_name: {"healthy": health.healthy, "checked_seconds_ago": round(now - health.checked_at, 3), "circuit": setup_breaker(setup_name).state}
+            for setup_name, health in self._setups.items()
+        }
+
+health_registry = HealthRegistry(config.HEALTH_TTL, config.HEALTH_PROBE_INTERVAL, config.HEALTH_IDLE_EXPIRY)
\ No newline at end of file
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app import config
+from app.services.consul_service import ConsulService
+from app.services.diff import split_diff
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source_setup TEXT NOT NULL,
+    destination_setup TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    delete_extraneous INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS job_services (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    service_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    batches_total INTEGER,
+    batches_done INTEGER NOT NULL DEFAULT 0,
+    keys_total INTEGER,
+    keys_written INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL,
+    message TEXT,
+    PRIMARY KEY (job_id, service_name)
+);
+CREATE TABLE IF NOT EXISTS job_batches (
+    job_id TEXT NOT NULL,
+    service_name TEXT NOT NULL,
+    batch_no INTEGER NOT NULL,
+    set_keys TEXT NOT NULL,
+    delete_keys TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, service_name, batch_no)
+);
+"""
+
+class JobStore:
+    # All SQLite access goes through one worker thread and one connection, so
+    # writes never contend with each other or block the event loop.
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def call(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def open(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            # Anything still marked active was cut off by a restart.
+            self._conn.execute("UPDATE jobs SET status = 'interrupted' WHERE status IN ('pending', 'running')")
+            self._conn.execute("UPDATE job_services SET status = 'interrupted' WHERE status = 'running'")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def create_job(self, job_id: str, source_setup: str, destination_setup: str, mode: str, delete_extraneous: bool, service_names: List[str]) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, source_setup, destination_setup, mode, delete_extraneous, status, created_at) VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                (job_id, source_setup, destination_setup, mode, int(delete_extraneous), time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO job_services (job_id, position, service_name, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, position, name) for position, name in enumerate(service_names)]
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        services = self._conn.execute("SELECT * FROM job_services WHERE job_id = ? ORDER BY position", (job_id,)).fetchall()
+        return {**dict(job), "services": [dict(service) for service in services]}
+
+    def set_job_status(self, job_id: str, status: str) -> None:
+        now = time.time()
+        with self._conn:
+            if status == "running":
+                self._conn.execute("UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?), finished_at = NULL WHERE id = ?", (status, now, job_id))
+            else:
+                self._conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (status, now, job_id))
+
+    def set_service_status(self, job_id: str, service_name: str, status: str, message: Optional[str] = None) -> None:
+        now = time.time()
+        with self._conn:
+            if status == "running":
+                self._conn.execute(
+                    "UPDATE job_services SET status = ?, message = NULL, started_at = COALESCE(started_at, ?), finished_at = NULL WHERE job_id = ? AND service_name = ?",
+                    (status, now, job_id, service_name)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE job_services SET status = ?, message = ?, finished_at = ? WHERE job_id = ? AND service_name = ?",
+                    (status, message, now, job_id, service_name)
+                )
+
+    def set_service_plan(self, job_id: str, service_name: str, batches: List[Tuple[List[str], List[str]]], keys_total: int) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO job_batches (job_id, service_name, batch_no, set_keys, delete_keys) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, service_name, batch_no, json.dumps(set_keys), json.dumps(delete_keys)) for batch_no, (set_keys, delete_keys) in enumerate(batches)]
+            )
+            self._conn.execute(
+                "UPDATE job_services SET batches_total = ?, keys_total = ? WHERE job_id = ? AND service_name = ?",
+                (len(batches), keys_total, job_id, service_name)
+            )
+
+    def pending_batches(self, job_id: str, service_name: str) -> List[Tuple[int, List[str], List[str]]]:
+        rows = self._conn.execute(
+            "SELECT batch_no, set_keys, delete_keys FROM job_batches WHERE job_id = ? AND service_name = ? AND done = 0 ORDER BY batch_no",
+            (job_id, service_name)
+        ).fetchall()
+        return [(row["batch_no"], json.loads(row["set_keys"]), json.loads(row["delete_keys"])) for row in rows]
+
+    def mark_batch_done(self, job_id: str, service_name: str, batch_no: int, keys_written: int) -> None:
+        with self._conn:
+            self._conn.execute(
+                "UPDATE job_batches SET done = 1 WHERE job_id = ? AND service_name = ? AND batch_no = ?",
+                (job_id, service_name, batch_no)
+            )
+            self._conn.execute(
+                "UPDATE job_services SET batches_done = batches_done + 1, keys_written = keys_written + ? WHERE job_id = ? AND service_name = ?",
+                (keys_written, job_id, service_name)
+            )
+
+def _rate(keys_written: int, started_at: Optional[float], finished_at: Optional[float]) -> Optional[float]:
+    if not started_at:
+        return None
+    elapsed = (finished_at or time.time()) - started_at
+    return round(keys_written / elapsed, 1) if elapsed > 0 else None
+
+def describe_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    services = job["services"]
+    keys_written = sum(service["keys_written"] for service in services)
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "source_setup": job["source_setup"],
+        "destination_setup": job["destination_setup"],
+        "mode": job["mode"],
+        "delete_extraneous": bool(job["delete_extraneous"]),
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "progress": {
+            "services_total": len(services),
+            "services_completed": sum(1 for service in services if service["status"] == "completed"),
+            "batches_total": sum(service["batches_total"] or 0 for service in services),
+            "batches_done": sum(service["batches_done"] for service in services),
+            "keys_written": keys_written,
+            "keys_per_second": _rate(keys_written, job["started_at"], job["finished_at"])
+        },
+        "services": {
+            service["service_name"]: {
+                "status": service["status"],
+                "batches_done": service["batches_done"],
+                "batches_total": service["batches_total"],
+                "keys_written": service["keys_written"],
+                "keys_total": service["keys_total"],
+                "keys_per_second": _rate(service["keys_written"], service["started_at"], service["finished_at"]),
+                "message": service["message"]
+            }
+            for service in services
+        }
+    }
+
+class JobRunner:
+    def __init__(self, store: JobStore, service_concurrency: int):
+        self.store = store
+        self.service_concurrency = service_concurrency
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        await self.store.call(self.store.open)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.store.call(self.store.close)
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._tasks
+
+    async def submit(self, source_setup: str, destination_setup: str, service_names: List[str], mode: str, delete_extraneous: bool) -> str:
+        job_id = uuid.uuid4().hex
+        await self.store.call(self.store.create_job, job_id, source_setup, destination_setup, mode, delete_extraneous, service_names)
+        self._launch(job_id)
+        return job_id
+
+    def resume(self, job_id: str) -> None:
+        self._launch(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.store.call(self.store.get_job, job_id)
+        return describe_job(job) if job else None
+
+    def _launch(self, job_id: str) -> None:
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.store.call(self.store.get_job, job_id)
+        await self.store.call(self.store.set_job_status, job_id, "running")
+        semaphore = asyncio.Semaphore(self.service_concurrency)
+        services = [service for service in job["services"] if service["status"] != "completed"]
+        try:
+            outcomes = await asyncio.gather(*(self._run_service(job, service, semaphore) for service in services))
+        except asyncio.CancelledError:
+            await asyncio.shield(self.store.call(self.store.set_job_status, job_id, "interrupted"))
+            raise
+        except Exception as e:
+            print(f"Error running transfer job {job_id}: {e}")
+            outcomes = [False]
+        await self.store.call(self.store.set_job_status, job_id, "completed" if all(outcomes) else "failed")
+
+    async def _run_service(self, job: Dict[str, Any], service: Dict[str, Any], semaphore: asyncio.Semaphore) -> bool:
+        job_id = job["id"]
+        name = service["service_name"]
+        async with semaphore:
+            try:
+                await self.store.call(self.store.set_service_status, job_id, name, "running")
+                source = ConsulService(job["source_setup"], name)
+                destination = ConsulService(job["destination_setup"], name)
+                source_properties = await source.get_encoded_keys()
+                if not source_properties:
+                    await self.store.call(self.store.set_service_status, job_id, name, "failed", "No properties found in source setup for this service")
+                    return False
+
+                # The batch plan is fixed the first time a service runs; a resumed
+                # job replays only the batches that never completed.
+                if service["batches_total"] is None:
+                    await self._plan_service(job, destination, source_properties)
+
+                for batch_no, set_keys, delete_keys in await self.store.call(self.store.pending_batches, job_id, name):
+                    properties = {key: source_properties[key] for key in set_keys if key in source_properties}
+                    for ops in destination.plan_batches(properties, delete_keys, encoded=True):
+                        if not await destination.run_txn(ops):
+                            await self.store.call(self.store.set_service_status, job_id, name, "failed", f"Transaction for batch {batch_no} failed")
+                            return False
+                    await self.store.call(self.store.mark_batch_done, job_id, name, batch_no, len(properties) + len(delete_keys))
+
+                await self.store.call(self.store.set_service_status, job_id, name, "completed")
+                return True
+            except asyncio.CancelledError:
+                await asyncio.shield(self.store.call(self.store.set_service_status, job_id, name, "interrupted"))
+                raise
+            except Exception as e:
+                await self.store.call(self.store.set_service_status, job_id, name, "failed", str(e))
+                return False
+
+    async def _plan_service(self, job: Dict[str, Any], destination: ConsulService, source_properties: Dict[str, str]) -> None:
+        to_delete: List[str] = []
+        if job["mode"] == "sync":
+            dest_properties = await destination.get_encoded_keys()
+            missing, extraneous, changed = split_diff(source_properties, dest_properties)
+            to_write = {key: source_properties[key] for key in sorted(missing | changed)}
+            if job["delete_extraneous"]:
+                to_delete = sorted(extraneous)
+        else:
+            to_write = {key: source_properties[key] for key in sorted(source_properties)}
+
+        prefix_length = len(f"config/{destination.service_name}/")
+        plan = []
+        for ops in destination.plan_batches(to_write, to_delete, encoded=True):
+            set_keys = [op['KV']['Key'][prefix_length:] for op in ops if op['KV']['Verb'] == 'set']
+            delete_keys = [op['KV']['Key'][prefix_length:] for op in ops if op['KV']['Verb'] == 'delete']
+            plan.append((set_keys, delete_keys))
+        await self.store.call(self.store.set_service_plan, job["id"], destination.service_name, plan, len(to_write) + len(to_delete))
+
+job_runner = JobRunner(JobStore(config.JOBS_DB_PATH), config.JOB_SERVICE_CONCURRENCY)
\ No newline at end of file
@@ -0,0 +1,43 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+_decoder = json.JSONDecoder()
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    # Yields the objects of a top-level JSON array of flat objects (the shape
+    # of a Consul ?recurse=true response) as soon as each one has arrived, so
+    # neither the whole body nor its parsed tree is ever held at once.
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    pending: List[str] = []
+    items = 0
+    async for chunk in chunks:
+        text = text_decoder.decode(chunk)
+        pending.append(text)
+        # An object can only be complete once its closing brace has arrived;
+        # waiting for one avoids re-scanning a large value on every chunk.
+        if '}' not in text:
+            continue
+
+        buffer = ''.join(pending)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+                position += 1
+            if position >= len(buffer) or buffer[position] == ']':
+                break
+            try:
+                item, position = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            items += 1
+            yield item
+        pending = [buffer[position:]]
+
+    rest = (''.join(pending) + text_decoder.decode(b'', final=True)).strip()
+    # A body without objects ("[]", "[ ]") never reaches the loop above, so
+    # its opening bracket is still here.
+    if not items and rest.startswith('['):
+        rest = rest[1:].lstrip()
+    if rest != ']':
+        raise ValueError("Truncated or malformed JSON array in Consul response")
\ No newline at end of file
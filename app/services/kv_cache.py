@@ -0,0 +1,89 @@
+import base64
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from app import config
+
+def decode_value(encoded: str, errors: str = 'replace') -> str:
+    # A value that is not UTF-8 text is shown with replacement characters
+    # instead of failing the whole read; callers that write decoded values
+    # back somewhere pass errors='strict'.
+    return base64.b64decode(encoded).decode('utf-8', errors) if encoded else ''
+
+def decode_properties(properties: Dict[str, str], errors: str = 'replace') -> Dict[str, str]:
+    return {key: decode_value(value, errors) for key, value in properties.items()}
+
+@dataclass
+class Snapshot:
+    index: str
+    # Values are kept base64-encoded as Consul returned them and decoded with
+    # decode_value() only when they are shown or need to be read.
+    data: Any
+    size: int
+    # Memoized content digests, keyed by service name ("" for a single-service
+    # snapshot). Valid for as long as the snapshot itself.
+    digests: Dict[str, str] = field(default_factory=dict)
+    # Set once the snapshot has been served from the cache, i.e. it is being
+    # reused and computing its digests can pay off.
+    from_cache: bool = False
+    # Memoized decoded properties, keyed like digests. Only kept for snapshots
+    # served from the cache, and not counted against CONSUL_CACHE_MAX_BYTES:
+    # a reused snapshot can take up to about twice its size.
+    decoded: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+def snapshot_properties(snapshot: Snapshot, service_name: str = "") -> Dict[str, str]:
+    # Shared between requests once memoized, so callers must not modify it.
+    decoded = snapshot.decoded.get(service_name)
+    if decoded is None:
+        properties = snapshot.data.get(service_name, {}) if service_name else snapshot.data
+        decoded = decode_properties(properties)
+        if snapshot.from_cache:
+            snapshot.decoded[service_name] = decoded
+    return decoded
+
+class KVSnapshotCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Snapshot]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, setup_name: str, prefix: str) -> Optional[Snapshot]:
+        snapshot = self._entries.get((setup_name, prefix))
+        if snapshot is not None:
+            self._entries.move_to_end((setup_name, prefix))
+        return snapshot
+
+    def put(self, setup_name: str, prefix: str, snapshot: Snapshot) -> None:
+        self.discard(setup_name, prefix)
+        if snapshot.size > self.max_bytes:
+            return
+        self._entries[(setup_name, prefix)] = snapshot
+        self._bytes += snapshot.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def discard(self, setup_name: str, prefix: str) -> None:
+        snapshot = self._entries.pop((setup_name, prefix), None)
+        if snapshot is not None:
+            self._bytes -= snapshot.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes
+        }
+
+snapshot_cache = KVSnapshotCache(config.CONSUL_CACHE_MAX_ENTRIES, config.CONSUL_CACHE_MAX_BYTES)
\ No newline at end of file
@@ -0,0 +1,150 @@
+import bisect
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+from app import config
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+OTHER_SETUP = "other"
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def label_set(**labels: str) -> str:
+    return ",".join(f'{name}="{escape_label(str(value))}"' for name, value in labels.items())
+
+# Timings collected for the request being handled, emitted as Server-Timing.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+_request_route: ContextVar[str] = ContextVar("request_route", default="")
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+
+class Metrics:
+    def __init__(self, enabled: bool, max_setups: int):
+        self.enabled = enabled
+        self.max_setups = max_setups
+        self.setups: Set[str] = set()
+        self.upstream_requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.upstream_seconds: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.upstream_bytes: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.phase_seconds: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+
+    def setup_label(self, setup_name: str, answered: bool = False) -> str:
+        # A setup is admitted once Consul has answered it with any HTTP status,
+        # so names that do not resolve or connect never get series of their own.
+        if setup_name in self.setups:
+            return setup_name
+        if answered and len(self.setups) < self.max_setups:
+            self.setups.add(setup_name)
+            return setup_name
+        return OTHER_SETUP
+
+    def record_upstream(self, setup_name: str, operation: str, status: str, seconds: float, sent: int, received: int) -> None:
+        if not self.enabled:
+            return
+        setup_name = self.setup_label(setup_name, answered=status.isdigit())
+        self.upstream_requests[(setup_name, operation, status)] += 1
+        self.upstream_seconds[(setup_name, operation)].observe(seconds)
+        self.upstream_bytes[(setup_name, operation, "sent")] += sent
+        self.upstream_bytes[(setup_name, operation, "received")] += received
+        timings = _request_timings.get()
+        if timings is not None:
+            timings["consul"] = timings.get("consul", 0.0) + seconds
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_phase(name)
+
+    @contextmanager
+    def _timed_phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phase_seconds[(_request_route.get(), name)].observe(seconds)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + seconds
+
+    def render(self, extra: List[str] = ()) -> str:
+        lines = [
+            "# HELP consul_upstream_requests_total Requests sent to Consul.",
+            "# TYPE consul_upstream_requests_total counter",
+        ]
+        for (setup_name, operation, status), count in sorted(self.upstream_requests.items()):
+            lines.append(f"consul_upstream_requests_total{{{label_set(setup=setup_name, operation=operation, status=status)}}} {count}")
+
+        lines += [
+            "# HELP consul_upstream_bytes_total Bytes exchanged with Consul.",
+            "# TYPE consul_upstream_bytes_total counter",
+        ]
+        for (setup_name, operation, direction), count in sorted(self.upstream_bytes.items()):
+            lines.append(f"consul_upstream_bytes_total{{{label_set(setup=setup_name, operation=operation, direction=direction)}}} {count}")
+
+        lines += _render_histograms(
+            "consul_upstream_request_seconds", "Latency of requests sent to Consul.",
+            {label_set(setup=setup_name, operation=operation): histogram for (setup_name, operation), histogram in self.upstream_seconds.items()},
+        )
+        lines += _render_histograms(
+            "consul_route_phase_seconds", "Time spent in each phase of a route.",
+            {label_set(route=route, phase=phase): histogram for (route, phase), histogram in self.phase_seconds.items()},
+        )
+        lines += list(extra)
+        return "\n".join(lines) + "\n"
+
+def _render_histograms(name: str, help_text: str, histograms: Dict[str, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return lines
+
+class ServerTimingMiddleware:
+    # Plain ASGI middleware so the handler runs in the same context and can
+    # add to the timings collected for this request.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        timings_token = _request_timings.set(timings)
+        route_token = _request_route.set(scope.get("path", ""))
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # Upstream calls overlap, so "consul" is their summed time and
+                # can exceed "total".
+                entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", ", ".join(entries).encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(timings_token)
+            _request_route.reset(route_token)
+
+metrics = Metrics(config.METRICS_ENABLED, config.METRICS_MAX_SETUPS)
\ No newline at end of file
@@ -0,0 +1,24 @@
+import json
+from typing import Any
+from fastapi.responses import Response
+
+# orjson is optional; without it the stdlib encoder is used with the same
+# compact output Starlette's JSONResponse produces.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    # For payloads the routes build themselves as plain dicts of strings:
+    # returned as-is, so FastAPI skips jsonable_encoder and response_model
+    # validation, and the content is encoded once.
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
\ No newline at end of file
@@ -0,0 +1,165 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app import config
+from app.services.concurrency import ordered_prefetch
+from app.services.consul_service import ConsulService, summarize_writes
+from app.services.diff import diff_properties
+from app.services.kv_cache import decode_properties
+
+# A snapshot is a gzipped JSONL file: one header line, then one line per
+# service ({"service": ..., "data": {...}}), so it can be written and read one
+# service at a time.
+SNAPSHOT_NAME = re.compile(r"^[A-Za-z0-9._-]+$")
+SNAPSHOT_FORMAT = 1
+
+def snapshot_path(snapshot_name: str) -> str:
+    if not SNAPSHOT_NAME.match(snapshot_name):
+        raise ValueError(f"Invalid snapshot name '{snapshot_name}'. Use letters, digits, '.', '_' or '-'.")
+    return os.path.join(config.SNAPSHOT_DIR, f"{snapshot_name}.jsonl.gz")
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    if not os.path.isdir(config.SNAPSHOT_DIR):
+        return []
+    snapshots = []
+    for file_name in sorted(os.listdir(config.SNAPSHOT_DIR)):
+        if file_name.endswith(".jsonl.gz"):
+            stat = os.stat(os.path.join(config.SNAPSHOT_DIR, file_name))
+            snapshots.append({"snapshot_name": file_name[:-len(".jsonl.gz")], "bytes": stat.st_size, "modified_at": stat.st_mtime})
+    return snapshots
+
+def _selected(service_name: str, requested: Optional[List[str]]) -> bool:
+    return requested is None or service_name in requested
+
+def _read_header(path: str) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return json.loads(handle.readline())
+
+async def read_snapshot(snapshot_name: str) -> Tuple[Dict[str, Any], AsyncIterator[Tuple[str, Dict[str, str]]]]:
+    path = snapshot_path(snapshot_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Snapshot '{snapshot_name}' not found")
+
+    header = await asyncio.to_thread(_read_header, path)
+
+    # The file is only opened once iteration starts, so a caller that fails
+    # before reading any service leaves nothing open; callers that may stop
+    # part way through close the iterator with aclose().
+    async def services() -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+        handle = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+        try:
+            await asyncio.to_thread(handle.readline)
+            while True:
+                line = await asyncio.to_thread(handle.readline)
+                if not line:
+                    break
+                entry = json.loads(line)
+                yield entry["service"], entry["data"]
+        finally:
+            await asyncio.to_thread(handle.close)
+
+    return header, services()
+
+async def _live_services(setup_name: str) -> List[str]:
+    service_names = await ConsulService(setup_name, "").list_services()
+    if service_names is None:
+        raise RuntimeError(f"Could not list services in '{setup_name}'")
+    return service_names
+
+async def _live_properties(setup_name: str, service_name: str) -> Dict[str, str]:
+    # Raises instead of returning {} so an unreadable service is never
+    # mistaken for one without properties.
+    snapshot = await ConsulService(setup_name, service_name).get_service_snapshot()
+    if snapshot is None:
+        raise RuntimeError(f"Could not read service '{service_name}' from '{setup_name}'")
+    # Snapshots are restored from the decoded text, so values must decode
+    # exactly.
+    try:
+        return decode_properties(snapshot.data, errors='strict')
+    except UnicodeDecodeError:
+        raise RuntimeError(f"Service '{service_name}' in '{setup_name}' has a value that is not UTF-8 text")
+
+async def export_snapshot(setup_name: str, snapshot_name: str, requested: Optional[List[str]]) -> Dict[str, Any]:
+    path = snapshot_path(snapshot_name)
+    os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+
+    service_names = await _live_services(setup_name)
+    service_names = [name for name in service_names if _selected(name, requested)]
+
+    async def fetch(service_name: str) -> Dict[str, str]:
+        return await _live_properties(setup_name, service_name)
+
+    # Written to a temporary file first so a failed export, including any
+    # service that could not be read, never replaces a good snapshot.
+    # The temporary name is unique, so concurrent exports of the same name
+    # never write or remove each other's file; the last to finish wins.
+    fd, temp_path = tempfile.mkstemp(dir=config.SNAPSHOT_DIR, prefix=f".{snapshot_name}.", suffix=".tmp")
+    os.close(fd)
+    handle = await asyncio.to_thread(gzip.open, temp_path, "wt", encoding="utf-8")
+    services = keys = 0
+    try:
+        header = {"format": SNAPSHOT_FORMAT, "setup_name": setup_name, "created_at": time.time()}
+        await asyncio.to_thread(handle.write, json.dumps(header) + "\n")
+        async for service_name, properties in ordered_prefetch(service_names, fetch, config.NDJSON_PREFETCH):
+            await asyncio.to_thread(handle.write, json.dumps({"service": service_name, "data": properties}) + "\n")
+            services += 1
+            keys += len(properties)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        os.remove(temp_path)
+        raise
+    await asyncio.to_thread(handle.close)
+    os.replace(temp_path, path)
+
+    return {"snapshot_name": snapshot_name, "setup_name": setup_name, "services": services, "keys": keys, "bytes": os.path.getsize(path)}
+
+async def import_snapshot(snapshot_name: str, setup_name: str, requested: Optional[List[str]]) -> Dict[str, Any]:
+    _, services = await read_snapshot(snapshot_name)
+    results = {}
+    try:
+        async for service_name, properties in services:
+            if not _selected(service_name, requested):
+                continue
+            if not properties:
+                results[service_name] = {"status": "skipped", "message": "No properties in snapshot for this service"}
+                continue
+            key_results = await ConsulService(setup_name, service_name).set_key_values(properties)
+            results[service_name] = {**summarize_writes(key_results), "keys": len(properties)}
+    finally:
+        await services.aclose()
+    return results
+
+async def compare_with_snapshot(setup_name: str, snapshot_name: str, requested: Optional[List[str]]) -> Dict[str, Any]:
+    _, services = await read_snapshot(snapshot_name)
+    live_services = await _live_services(setup_name)
+
+    async def selected() -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+        async for service_name, snapshot_properties in services:
+            if _selected(service_name, requested):
+                yield service_name, snapshot_properties
+
+    async def fetch(entry: Tuple[str, Dict[str, str]]) -> Dict[str, str]:
+        # Services removed since the snapshot was taken have nothing to read.
+        if entry[0] not in live_services:
+            return {}
+        return await _live_properties(setup_name, entry[0])
+
+    results = {}
+    entries = selected()
+    try:
+        async for (service_name, snapshot_properties), live_properties in ordered_prefetch(entries, fetch, config.NDJSON_PREFETCH):
+            results[service_name] = diff_properties(service_name, live_properties, snapshot_properties, setup_name, snapshot_name)
+    finally:
+        await entries.aclose()
+        await services.aclose()
+
+    # Services created since the snapshot was taken exist only on the live side.
+    live_only = [name for name in live_services if name not in results and _selected(name, requested)]
+    async for service_name, live_properties in ordered_prefetch(live_only, lambda name: _live_properties(setup_name, name), config.NDJSON_PREFETCH):
+        results[service_name] = diff_properties(service_name, live_properties, {}, setup_name, snapshot_name)
+    return results
\ No newline at end of file
@@ -0,0 +1,130 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from app import config
+from app.services.consul_service import ConsulService
+from app.services.diff import split_diff
+from app.services.kv_cache import decode_properties, decode_value
+
+Event = Tuple[str, Dict[str, Any]]
+
+@dataclass
+class Watch:
+    setup_name: str
+    service_name: str
+    subscribers: Set[asyncio.Queue] = field(default_factory=set)
+    properties: Optional[Dict[str, str]] = None
+    index: str = ""
+    task: Optional[asyncio.Task] = None
+
+class WatchHub:
+    # One upstream blocking query per (setup, service), fanned out to every
+    # subscribed client queue. At most max_watches pairs are watched at once,
+    # one per connection of the watch client's pool.
+    def __init__(self, wait: float, retry_delay: float, queue_size: int, max_watches: int):
+        self.wait = wait
+        self.retry_delay = retry_delay
+        self.queue_size = queue_size
+        self.max_watches = max_watches
+        self._watches: Dict[Tuple[str, str], Watch] = {}
+
+    def can_watch(self, setup_name: str, service_names: Iterable[str]) -> bool:
+        # Services someone already watches share the existing query and cost
+        # nothing extra.
+        new_watches = sum(1 for name in set(service_names) if (setup_name, name) not in self._watches)
+        return len(self._watches) + new_watches <= self.max_watches
+
+    def subscribe_many(self, setup_name: str, service_names: Iterable[str], queue: asyncio.Queue) -> bool:
+        # Checks the limit and subscribes with no await in between, so
+        # concurrent requests cannot all pass the check and exceed it.
+        service_names = list(service_names)
+        if not self.can_watch(setup_name, service_names):
+            return False
+        for name in service_names:
+            self.subscribe(setup_name, name, queue)
+        return True
+
+    def subscribe(self, setup_name: str, service_name: str, queue: asyncio.Queue) -> None:
+        watch = self._watches.get((setup_name, service_name))
+        if watch is None:
+            watch = self._watches[(setup_name, service_name)] = Watch(setup_name, service_name)
+            watch.task = asyncio.create_task(self._run(watch))
+        watch.subscribers.add(queue)
+        if watch.properties is not None:
+            self._deliver(queue, self._snapshot_event(watch))
+
+    def unsubscribe(self, setup_name: str, service_name: str, queue: asyncio.Queue) -> None:
+        watch = self._watches.get((setup_name, service_name))
+        if watch is None:
+            return
+        watch.subscribers.discard(queue)
+        if not watch.subscribers:
+            del self._watches[(setup_name, service_name)]
+            watch.task.cancel()
+
+    @staticmethod
+    def _snapshot_event(watch: Watch) -> Event:
+        return "snapshot", {"setup_name": watch.setup_name, "service": watch.service_name, "index": watch.index, "data": decode_properties(watch.properties)}
+
+    def _deliver(self, queue: asyncio.Queue, event: Event) -> None:
+        if queue.qsize() < self.queue_size:
+            queue.put_nowait(event)
+            return
+        # The client has fallen too far behind to replay every change; drop
+        # what it has not read and send the current state of its watches.
+        while not queue.empty():
+            queue.get_nowait()
+        for watch in self._watches.values():
+            if queue in watch.subscribers and watch.properties is not None:
+                queue.put_nowait(self._snapshot_event(watch))
+
+    def _broadcast(self, watch: Watch, event: Event) -> None:
+        for queue in list(watch.subscribers):
+            self._deliver(queue, event)
+
+    async def _run(self, watch: Watch) -> None:
+        service = ConsulService(watch.setup_name, watch.service_name)
+        while True:
+            try:
+                snapshot = await service.watch_service(watch.index, self.wait)
+            except Exception as e:
+                print(f"Error watching {watch.service_name} in {watch.setup_name}: {e}")
+                snapshot = None
+            if snapshot is None:
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            # An index that moves backwards (e.g. after a snapshot restore)
+            # is not comparable; re-read from 0 and diff the contents instead.
+            if watch.index and snapshot.index and int(snapshot.index) < int(watch.index):
+                watch.index = ""
+                continue
+            if watch.properties is not None and snapshot.index == watch.index:
+                continue
+
+            previous = watch.properties
+            watch.properties = snapshot.data
+            watch.index = snapshot.index
+            if previous is None:
+                self._broadcast(watch, self._snapshot_event(watch))
+                continue
+
+            removed, added, changed = split_diff(previous, snapshot.data)
+            if added or changed or removed:
+                self._broadcast(watch, ("change", {
+                    "setup_name": watch.setup_name,
+                    "service": watch.service_name,
+                    "index": watch.index,
+                    "added": {key: decode_value(snapshot.data[key]) for key in added},
+                    "changed": {key: decode_value(snapshot.data[key]) for key in changed},
+                    "removed": sorted(removed)
+                }))
+
+    async def stop(self) -> None:
+        watches = list(self._watches.values())
+        self._watches.clear()
+        for watch in watches:
+            watch.task.cancel()
+        await asyncio.gather(*(watch.task for watch in watches), return_exceptions=True)
+
+watch_hub = WatchHub(config.WATCH_WAIT, config.WATCH_RETRY_DELAY, config.WATCH_QUEUE_SIZE, config.WATCH_MAX_CONNECTIONS)
\ No newline at end of file
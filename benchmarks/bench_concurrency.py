@@ -0,0 +1,77 @@
+"""Concurrent GET /api/v1/consul/properties throughput against a slow Consul.
+
+Every upstream call takes LATENCY seconds. The "blocking" run stands in for the
+old requests-based client by sleeping on the event loop thread; the "async" run
+awaits the pooled httpx client. Each request reads from its own setup, so no
+two upstream calls are identical and none are merged by single-flight. Usage:
+
+    python -m benchmarks.bench_concurrency [concurrency] [latency]
+"""
+import asyncio
+import base64
+import sys
+import time
+
+import httpx
+
+from app.main import app
+from app.services import consul_service
+
+SERVICE = "svc"
+
+
+def _route(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/v1/status/leader":
+        return httpx.Response(200, json="127.0.0.1:8300")
+    if request.url.params.get("keys") == "true":
+        return httpx.Response(200, json=[f"config/{SERVICE}/", f"config/{SERVICE}/key"])
+    value = base64.b64encode(b"value").decode()
+    return httpx.Response(200, json=[{"Key": f"config/{SERVICE}/key", "Value": value}])
+
+
+def blocking_handler(latency: float):
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency)
+        return _route(request)
+    return handler
+
+
+def async_handler(latency: float):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return _route(request)
+    return handler
+
+
+async def run(handler, concurrency: int) -> float:
+    await consul_service.open_client(transport=httpx.MockTransport(handler))
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.get("/api/v1/consul/properties", params={"setup_name": f"bench{i}", "service_name": SERVICE})
+                for i in range(concurrency)
+            ))
+            elapsed = time.perf_counter() - start
+            assert all(r.status_code == 200 for r in responses)
+            return elapsed
+    finally:
+        await consul_service.close_client()
+
+
+async def run_all(concurrency: int, latency: float):
+    for name, handler in (("blocking", blocking_handler(latency)), ("async", async_handler(latency))):
+        elapsed = await run(handler, concurrency)
+        print(f"{name:>8}: {concurrency} requests in {elapsed:.2f}s ({concurrency / elapsed:.1f} req/s)")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    asyncio.run(run_all(concurrency, latency))
+
+
+if __name__ == "__main__":
+    main()
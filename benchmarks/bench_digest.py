@@ -0,0 +1,109 @@
+"""Compare of hundreds of mostly identical services, with and without digests.
+
+Builds two setups whose services are identical except for a few, then times
+the diff phase: a full per-key diff of every service, diff_snapshots over
+fresh reads (dict equality fast path), over snapshots reused from the cache
+the first time (digests computed and memoized) and again (digests reused).
+Also times end-to-end compare requests once the snapshot cache is warm.
+Usage:
+
+    python -m benchmarks.bench_digest [services] [keys] [different]
+"""
+import asyncio
+import base64
+import sys
+import time
+
+import httpx
+
+from app import config
+from app.main import app
+from app.services import consul_service
+from app.services.diff import diff_properties, diff_snapshots
+from app.services.kv_cache import Snapshot
+from benchmarks.fake_consul import FakeConsul
+
+
+def build_setups(services: int, keys: int, different: int):
+    setups = {"a": {}, "b": {}}
+    for i in range(services):
+        properties = {f"key{k}": f"value-{i}-{k}-" + "x" * 40 for k in range(keys)}
+        setups["a"][f"svc{i}"] = properties
+        setups["b"][f"svc{i}"] = dict(properties)
+        if i < different:
+            setups["b"][f"svc{i}"]["key0"] = "changed"
+    return setups
+
+
+def encode_tree(services):
+    # Snapshots hold values base64-encoded, as Consul returns them.
+    return {
+        name: {key: base64.b64encode(value.encode("utf-8")).decode("ascii") for key, value in properties.items()}
+        for name, properties in services.items()
+    }
+
+
+def time_diff_phase(setups):
+    tree_a, tree_b = encode_tree(setups["a"]), encode_tree(setups["b"])
+    names = list(setups["a"])
+
+    def run(snapshot_a, snapshot_b) -> float:
+        start = time.perf_counter()
+        for name in names:
+            diff_snapshots(name, snapshot_a, snapshot_b, "a", "b", service_key=name)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names:
+        diff_properties(name, tree_a[name], tree_b[name], "a", "b")
+    full = time.perf_counter() - start
+
+    fresh = run(Snapshot("1", tree_a, 0), Snapshot("1", tree_b, 0))
+    cached_a = Snapshot("1", tree_a, 0, from_cache=True)
+    cached_b = Snapshot("1", tree_b, 0, from_cache=True)
+    first_cached = run(cached_a, cached_b)
+    warm = run(cached_a, cached_b)
+    return full, fresh, first_cached, warm
+
+
+async def time_requests(setups, rounds: int = 5):
+    fake = FakeConsul()
+    for setup, services in setups.items():
+        fake.load(setup, services)
+    config.CONSUL_URL_TEMPLATE = fake.url_template
+
+    await consul_service.open_client(transport=fake.transport())
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            params = {"source_setup": "a", "destination_setup": "b", "service_name": "all"}
+            timings = []
+            for _ in range(rounds + 1):
+                start = time.perf_counter()
+                response = await client.get("/api/v1/consul/properties/compare", params=params)
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+            return timings[0], min(timings[1:])
+    finally:
+        await consul_service.close_client()
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    different = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    setups = build_setups(services, keys, different)
+
+    full, fresh, first_cached, warm = time_diff_phase(setups)
+    print(f"diff phase, {services} services x {keys} keys, {different} different:")
+    print(f"  full per-key diff:                  {full * 1000:.1f} ms")
+    print(f"  fresh reads (equality fast path):   {fresh * 1000:.1f} ms")
+    print(f"  cached, first compare (digests):    {first_cached * 1000:.1f} ms")
+    print(f"  cached, repeat compare (memoized):  {warm * 1000:.1f} ms")
+
+    cold, warm = asyncio.run(time_requests(setups))
+    print(f"compare service_name=all: first {cold * 1000:.1f} ms, warm cache {warm * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latency and peak memory of GET, compare and transfer against FakeConsul.
+
+For each size (services x keys per service) two setups are seeded with the
+same tree, with a tenth of the services changed on the destination. Each
+endpoint is called `rounds` times with no_cache=true so every call goes
+upstream; p50/p99 come from those runs and peak memory from one extra run
+under tracemalloc. Usage:
+
+    python -m benchmarks.bench_endpoints [sizes] [rounds] [latency]
+    python -m benchmarks.bench_endpoints 10x100,500x2000 5 0.005
+"""
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+from app import config
+from app.main import app
+from app.services import consul_service
+from benchmarks.fake_consul import FakeConsul
+
+
+def build_services(services: int, keys: int, salt: str = ""):
+    return {
+        f"svc{i}": {f"key{k}": f"value-{i}-{k}{salt if i % 10 == 0 else ''}-" + "x" * 32 for k in range(keys)}
+        for i in range(services)
+    }
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def measure(client: httpx.AsyncClient, method: str, url: str, rounds: int, **kwargs):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text[:200]
+
+    tracemalloc.start()
+    response = await client.request(method, url, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak, len(response.content)
+
+
+async def run_size(services: int, keys: int, rounds: int, latency: float):
+    fake = FakeConsul(latency=latency)
+    fake.load("source", build_services(services, keys))
+    fake.load("destination", build_services(services, keys, salt="-changed"))
+    config.CONSUL_URL_TEMPLATE = fake.url_template
+
+    names = ",".join(f"svc{i}" for i in range(services))
+    scenarios = [
+        ("GET all", "GET", "/api/v1/consul/properties", {"params": {"setup_name": "source", "service_name": "all", "no_cache": "true"}}),
+        ("compare all", "GET", "/api/v1/consul/properties/compare", {"params": {"source_setup": "source", "destination_setup": "destination", "service_name": "all", "no_cache": "true"}}),
+        ("transfer", "POST", "/api/v1/consul/properties/transfer", {"json": {"source_setup": "source", "destination_setup": "destination", "service_name": names}}),
+    ]
+
+    await consul_service.open_client(transport=fake.transport())
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, method, url, kwargs in scenarios:
+                timings, peak, size = await measure(client, method, url, rounds, **kwargs)
+                print(
+                    f"{services:>5}x{keys:<5} {name:<12} p50 {percentile(timings, 0.5) * 1000:9.1f} ms"
+                    f"  p99 {percentile(timings, 0.99) * 1000:9.1f} ms"
+                    f"  mean {statistics.mean(timings) * 1000:9.1f} ms"
+                    f"  peak {peak / 2 ** 20:8.1f} MiB  body {size / 2 ** 20:7.1f} MiB"
+                )
+    finally:
+        await consul_service.close_client()
+
+
+async def run_sizes(sizes: str, rounds: int, latency: float):
+    for size in sizes.split(","):
+        services, keys = (int(part) for part in size.split("x"))
+        await run_size(services, keys, rounds, latency)
+
+
+def main():
+    sizes = sys.argv[1] if len(sys.argv) > 1 else "10x100,100x200"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.005
+    asyncio.run(run_sizes(sizes, rounds, latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Wall-clock time of a multi-service compare against a slow Consul.
+
+Each upstream call takes LATENCY seconds, so a sequential compare of N services
+costs about 2 * N * LATENCY. With concurrent fan-out it should stay close to a
+handful of round trips regardless of N. Usage:
+
+    python -m benchmarks.bench_fanout [services] [latency]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app import config
+from app.main import app
+from app.services import consul_service
+from benchmarks.fake_consul import FakeConsul
+
+
+async def run(services: int, latency: float) -> float:
+    names = [f"svc{i}" for i in range(services)]
+    fake = FakeConsul(latency=latency)
+    for setup in ("a", "b"):
+        fake.load(setup, {name: {"key": "value"} for name in names})
+    config.CONSUL_URL_TEMPLATE = fake.url_template
+
+    await consul_service.open_client(transport=fake.transport())
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            params = {"source_setup": "a", "destination_setup": "b", "service_name": ",".join(names), "no_cache": "true"}
+            start = time.perf_counter()
+            response = await client.get("/api/v1/consul/properties/compare", params=params)
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.text
+            assert list(response.json()["results"]) == names
+            return elapsed
+    finally:
+        await consul_service.close_client()
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    elapsed = asyncio.run(run(services, latency))
+    sequential = (2 + 2 + 2 * services) * latency
+    print(f"compare of {services} services: {elapsed:.2f}s (sequential estimate {sequential:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Buffered versus streaming parsing of a large ?recurse=true response.
+
+Builds one service's recurse body with many small keys and a few multi-MB
+blob values, then processes it the old way (whole body, json.loads, decode
+every value) and the new way (iter_json_array over 64 KiB chunks, values
+left base64-encoded). The "compare" rows then decode only the values that
+differ from a second copy in which `different` keys were changed. Reports
+time and tracemalloc peak for each. Usage:
+
+    python -m benchmarks.bench_parse [keys] [blobs] [blob_mib] [different]
+"""
+import asyncio
+import base64
+import json
+import sys
+import time
+import tracemalloc
+
+from app.services.consul_service import ConsulService
+from app.services.diff import diff_properties
+from app.services.json_stream import iter_json_array
+from app.services.kv_cache import decode_value
+
+CHUNK = 64 * 1024
+
+
+def build_body(keys: int, blobs: int, blob_mib: float) -> bytes:
+    items = []
+    for k in range(keys):
+        items.append({"Key": f"config/svc/key{k}", "Value": base64.b64encode(f"value-{k}-".encode() + b"x" * 64).decode("ascii")})
+    for b in range(blobs):
+        blob = (b"%d" % b) * int(blob_mib * 2 ** 20)
+        items.append({"Key": f"config/svc/blob{b}", "Value": base64.b64encode(blob).decode("ascii")})
+    return json.dumps(items).encode("utf-8")
+
+
+async def chunks(body: bytes):
+    for start in range(0, len(body), CHUNK):
+        yield body[start:start + CHUNK]
+
+
+async def buffered(body: bytes):
+    content = b"".join([chunk async for chunk in chunks(body)])
+    return {item["Key"].split("/")[-1]: base64.b64decode(item["Value"]).decode("utf-8") for item in json.loads(content)}
+
+
+async def streamed(body: bytes):
+    return await ConsulService._parse_service(iter_json_array(chunks(body)))
+
+
+async def measure(label: str, run):
+    start = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} {elapsed * 1000:9.1f} ms  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+async def run_all(keys: int, blobs: int, blob_mib: float, different: int):
+    body = build_body(keys, blobs, blob_mib)
+    other = body
+    for k in range(different):
+        other = other.replace(base64.b64encode(f"value-{k}-".encode() + b"x" * 64), base64.b64encode(f"changed-{k}-".encode() + b"x" * 64), 1)
+    print(f"{keys} keys + {blobs} x {blob_mib} MiB blobs, body {len(body) / 2 ** 20:.1f} MiB:")
+
+    await measure("parse, buffered", lambda: buffered(body))
+    await measure("parse, streamed", lambda: streamed(body))
+
+    async def compare_buffered():
+        diff_properties("svc", await buffered(body), await buffered(other), "a", "b")
+
+    async def compare_streamed():
+        diff_properties("svc", await streamed(body), await streamed(other), "a", "b", decode_value)
+
+    await measure("compare, buffered", compare_buffered)
+    await measure("compare, streamed", compare_streamed)
+
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    blobs = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    blob_mib = float(sys.argv[3]) if len(sys.argv) > 3 else 8
+    different = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    asyncio.run(run_all(keys, blobs, blob_mib, different))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Encoding cost and bytes on the wire for a large service_name=all response.
+
+First times, in CPU seconds, the ways a multi-MB payload has been encoded
+by the routes: FastAPI's default path (pydantic response model validation
+plus jsonable_encoder plus JSONResponse), JSONResponse alone, and
+FastJSONResponse (orjson when installed, compact stdlib json otherwise).
+Then requests GET service_name=all through the app with each
+Accept-Encoding and reports the body size actually sent. Usage:
+
+    python -m benchmarks.bench_serialize [services] [keys] [rounds]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import config
+from app.main import app
+from app.routes.transfer import TransferResponse
+from app.services import consul_service, serialization
+from app.services.serialization import FastJSONResponse
+from benchmarks.fake_consul import FakeConsul
+
+
+def build_services(services: int, keys: int):
+    return {
+        f"svc{i}": {f"key.{k}": f"jdbc:postgresql://db-{i}.internal:5432/app?pool={k}&ssl=true" for k in range(keys)}
+        for i in range(services)
+    }
+
+
+def cpu_time(encode, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.process_time()
+        encode()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def time_encoders(services, rounds: int):
+    payload = {"message": "Transferred", "source_setup": "a", "destination_setup": "b", "results": services}
+    size = len(FastJSONResponse(content=payload).body)
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"encoding a {size / 2 ** 20:.1f} MiB payload (best of {rounds}, CPU time):")
+    for label, encode in [
+        ("response_model + jsonable_encoder + JSONResponse", lambda: JSONResponse(content=jsonable_encoder(TransferResponse(**payload)))),
+        ("JSONResponse", lambda: JSONResponse(content=payload)),
+        (f"FastJSONResponse ({encoder})", lambda: FastJSONResponse(content=payload)),
+    ]:
+        print(f"  {label:<50} {cpu_time(encode, rounds) * 1000:8.1f} ms")
+
+
+async def time_wire(services, rounds: int):
+    fake = FakeConsul()
+    fake.load("a", services)
+    config.CONSUL_URL_TEMPLATE = fake.url_template
+
+    await consul_service.open_client(transport=fake.transport())
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            params = {"setup_name": "a", "service_name": "all"}
+            print("GET service_name=all, bytes sent and CPU time per request (warm cache):")
+            for accept in ("identity", "gzip", "br"):
+                await client.get("/api/v1/consul/properties", params=params, headers={"Accept-Encoding": accept})
+                start = time.process_time()
+                for _ in range(rounds):
+                    response = await client.get("/api/v1/consul/properties", params=params, headers={"Accept-Encoding": accept})
+                cpu = (time.process_time() - start) / rounds
+                sent = int(response.headers.get("content-length", len(response.content)))
+                encoding = response.headers.get("content-encoding", "identity")
+                print(f"  Accept-Encoding {accept:<9} -> {encoding:<9} {sent / 2 ** 20:8.2f} MiB  {cpu * 1000:8.1f} ms")
+    finally:
+        await consul_service.close_client()
+
+
+def main():
+    services = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    tree = build_services(services, keys)
+    time_encoders(tree, rounds)
+    asyncio.run(time_wire(tree, rounds))
+
+
+if __name__ == "__main__":
+    main()
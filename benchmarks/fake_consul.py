@@ -0,0 +1,216 @@
+"""In-process stand-in for the parts of the Consul HTTP API the app uses.
+
+Serves /v1/status/leader, /v1/kv (GET with ?recurse, ?keys, ?separator and
+blocking ?index=/&wait=, PUT, DELETE) and /v1/txn, with X-Consul-Index headers,
+through an httpx transport so no sockets are opened. Every request can be
+delayed by a fixed latency plus random jitter to mimic a remote cluster.
+
+    fake = FakeConsul(latency=0.02)
+    fake.load("setup-a", {"service": {"key": "value"}})
+    config.CONSUL_URL_TEMPLATE = fake.url_template
+    await consul_service.open_client(transport=fake.transport())
+"""
+import asyncio
+import base64
+import bisect
+import json
+import random
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+
+@dataclass
+class Entry:
+    value: bytes
+    create_index: int
+    modify_index: int
+
+
+def parse_wait(wait: str) -> float:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)(ms|s|m)?", wait)
+    if not match:
+        return 300.0
+    amount, unit = float(match.group(1)), match.group(2) or "s"
+    return amount / 1000 if unit == "ms" else amount * 60 if unit == "m" else amount
+
+
+class FakeConsul:
+    url_template = "http://{setup}.consul.test"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, max_txn_ops: int = 64):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_txn_ops = max_txn_ops
+        self.stores: Dict[str, Dict[str, Entry]] = defaultdict(dict)
+        self.sorted_keys: Dict[str, List[str]] = defaultdict(list)
+        self.tombstones: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.indexes: Dict[str, int] = defaultdict(lambda: 1)
+        self.requests: Counter = Counter()
+        self._changed: Dict[str, asyncio.Condition] = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def load(self, setup: str, services: Dict[str, Dict[str, str]]) -> None:
+        index = self._next_index(setup)
+        store = self.stores[setup]
+        for service, properties in services.items():
+            store[f"config/{service}/"] = Entry(b"", index, index)
+            for key, value in properties.items():
+                store[f"config/{service}/{key}"] = Entry(str(value).encode("utf-8"), index, index)
+        self.sorted_keys[setup] = sorted(store)
+
+    def services(self, setup: str) -> Dict[str, Dict[str, str]]:
+        results: Dict[str, Dict[str, str]] = {}
+        for key, entry in self.stores[setup].items():
+            parts = key.split("/")
+            if len(parts) >= 3 and parts[0] == "config":
+                properties = results.setdefault(parts[1], {})
+                if parts[-1]:
+                    properties[parts[-1]] = entry.value.decode("utf-8")
+        return results
+
+    def set(self, setup: str, key: str, value: bytes, index: Optional[int] = None) -> None:
+        index = index or self._next_index(setup)
+        existing = self.stores[setup].get(key)
+        if existing is None:
+            bisect.insort(self.sorted_keys[setup], key)
+        self.stores[setup][key] = Entry(value, existing.create_index if existing else index, index)
+        self.tombstones[setup].pop(key, None)
+        self._notify(setup)
+
+    def delete(self, setup: str, key: str, index: Optional[int] = None) -> None:
+        if key in self.stores[setup]:
+            index = index or self._next_index(setup)
+            del self.stores[setup][key]
+            keys = self.sorted_keys[setup]
+            del keys[bisect.bisect_left(keys, key)]
+            self.tombstones[setup][key] = index
+            self._notify(setup)
+
+    def keys_with_prefix(self, setup: str, prefix: str) -> List[str]:
+        keys = self.sorted_keys[setup]
+        return keys[bisect.bisect_left(keys, prefix):bisect.bisect_left(keys, prefix + "\uffff")]
+
+    def prefix_index(self, setup: str, prefix: str) -> int:
+        store = self.stores[setup]
+        index = max((store[key].modify_index for key in self.keys_with_prefix(setup, prefix)), default=0)
+        for key, deleted_at in self.tombstones[setup].items():
+            if key.startswith(prefix):
+                index = max(index, deleted_at)
+        return index or self.indexes[setup]
+
+    def _next_index(self, setup: str) -> int:
+        self.indexes[setup] += 1
+        return self.indexes[setup]
+
+    def _condition(self, setup: str) -> asyncio.Condition:
+        if setup not in self._changed:
+            self._changed[setup] = asyncio.Condition()
+        return self._changed[setup]
+
+    def _notify(self, setup: str) -> None:
+        condition = self._changed.get(setup)
+        if condition is not None:
+            async def wake():
+                async with condition:
+                    condition.notify_all()
+            asyncio.ensure_future(wake())
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        setup = request.url.host.split(".")[0]
+        path = request.url.path
+        self.requests[(request.method, path.split("/")[2] if path.count("/") >= 2 else path)] += 1
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if path == "/v1/status/leader":
+            return httpx.Response(200, json="127.0.0.1:8300")
+        if path == "/v1/txn" and request.method == "PUT":
+            return self._txn(setup, json.loads(request.content))
+        if path.startswith("/v1/kv/"):
+            key = path[len("/v1/kv/"):]
+            if request.method == "GET":
+                return await self._get(setup, key, request.url.params)
+            if request.method == "PUT":
+                self.set(setup, key, request.content)
+                return httpx.Response(200, json=True)
+            if request.method == "DELETE":
+                self.delete(setup, key)
+                return httpx.Response(200, json=True)
+        return httpx.Response(404, text="not found")
+
+    async def _get(self, setup: str, key: str, params: httpx.QueryParams) -> httpx.Response:
+        if "index" in params:
+            known = int(params["index"])
+            timeout = parse_wait(params.get("wait", "5m"))
+            condition = self._condition(setup)
+
+            async def changed():
+                async with condition:
+                    await condition.wait_for(lambda: self.prefix_index(setup, key) > known)
+
+            # asyncio.wait rather than wait_for: on Python 3.11 wait_for can
+            # swallow a cancellation that races with the wait ending, which
+            # leaves a cancelled watch hanging in its next blocking query.
+            waiter = asyncio.ensure_future(changed())
+            try:
+                await asyncio.wait({waiter}, timeout=timeout)
+            finally:
+                waiter.cancel()
+
+        store = self.stores[setup]
+        headers = {"X-Consul-Index": str(self.prefix_index(setup, key))}
+
+        if params.get("keys") == "true":
+            separator = params.get("separator")
+            keys: List[str] = []
+            for name in self.keys_with_prefix(setup, key):
+                if separator:
+                    rest = name[len(key):]
+                    if separator in rest:
+                        name = key + rest[:rest.index(separator) + len(separator)]
+                if not keys or keys[-1] != name:
+                    keys.append(name)
+            return httpx.Response(200 if keys else 404, json=keys, headers=headers)
+
+        if params.get("recurse") in ("true", ""):
+            names = self.keys_with_prefix(setup, key)
+        else:
+            names = [key] if key in store else []
+        if not names:
+            return httpx.Response(404, headers=headers)
+        return httpx.Response(200, json=[self._item(name, store[name]) for name in names], headers=headers)
+
+    def _item(self, key: str, entry: Entry) -> dict:
+        return {
+            "Key": key,
+            "Value": base64.b64encode(entry.value).decode("ascii") if entry.value else None,
+            "CreateIndex": entry.create_index,
+            "ModifyIndex": entry.modify_index,
+            "LockIndex": 0,
+            "Flags": 0,
+        }
+
+    def _txn(self, setup: str, ops: List[dict]) -> httpx.Response:
+        if len(ops) > self.max_txn_ops:
+            return httpx.Response(413, text=f"Transaction contains too many operations ({len(ops)} > {self.max_txn_ops})")
+        # A transaction is a single Raft entry, so every op shares one index.
+        index = self._next_index(setup)
+        results = []
+        for op in ops:
+            kv = op["KV"]
+            if kv["Verb"] == "set":
+                self.set(setup, kv["Key"], base64.b64decode(kv.get("Value") or ""), index)
+                results.append({"KV": self._item(kv["Key"], self.stores[setup][kv["Key"]])})
+            elif kv["Verb"] == "delete":
+                self.delete(setup, kv["Key"], index)
+            elif kv["Verb"] == "delete-tree":
+                for name in self.keys_with_prefix(setup, kv["Key"]):
+                    self.delete(setup, name, index)
+        return httpx.Response(200, json={"Results": results, "Errors": None}, headers={"X-Consul-Index": str(index)})
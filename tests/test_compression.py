@@ -0,0 +1,126 @@
+import asyncio
+import zlib
+
+import pytest
+
+from app.services import compression
+from app.services.compression import CompressionMiddleware, accepted_encodings
+
+MINIMUM_SIZE = 100
+JSON = (b"content-type", b"application/json")
+
+
+def make_app(chunks, headers=(JSON,)):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": list(headers)})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def call(app, accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode("latin-1"))] if accept_encoding is not None else []
+    middleware = CompressionMiddleware(app, minimum_size=MINIMUM_SIZE, gzip_level=6, brotli_quality=4)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/", "headers": headers}, receive, send))
+    start, bodies = messages[0], messages[1:]
+    return dict((name.lower(), value) for name, value in start["headers"]), [body["body"] for body in bodies], [body.get("more_body", False) for body in bodies]
+
+
+def gunzip(data: bytes) -> bytes:
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+def test_small_body_is_sent_as_is():
+    headers, bodies, _ = call(make_app([b'{"a":1}']), "gzip")
+    assert b"content-encoding" not in headers
+    assert bodies == [b'{"a":1}']
+
+
+def test_whole_body_is_compressed_with_exact_length():
+    body = b'{"key":"' + b"value" * 200 + b'"}'
+    headers, bodies, more = call(make_app([body], headers=(JSON, (b"content-length", str(len(body)).encode()))), "gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"content-length"] == str(len(bodies[0])).encode()
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert more == [False]
+    assert gunzip(bodies[0]) == body
+
+
+def test_streamed_body_is_decodable_chunk_by_chunk():
+    lines = [b'{"service":"svc%d","data":{}}\n' % i for i in range(5)]
+    headers, bodies, more = call(make_app(lines, headers=((b"content-type", b"application/x-ndjson"),)), "gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert more == [True, True, True, True, False]
+
+    # Each compressed chunk yields its own line as soon as it arrives.
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert [decoder.decompress(chunk) for chunk in bodies] == lines
+    assert decoder.eof
+
+
+def test_without_accept_encoding_nothing_changes():
+    body = b"x" * 1000
+    headers, bodies, _ = call(make_app([body]))
+    assert b"content-encoding" not in headers
+    assert bodies == [body]
+
+
+@pytest.mark.parametrize("headers", [
+    ((b"content-type", b"text/event-stream"),),
+    (JSON, (b"content-encoding", b"identity")),
+])
+def test_event_streams_and_encoded_bodies_pass_through(headers):
+    body = b"x" * 1000
+    sent_headers, bodies, _ = call(make_app([body], headers=headers), "gzip")
+    assert sent_headers.get(b"content-encoding") in (None, b"identity")
+    assert bodies == [body]
+
+
+def test_existing_vary_is_merged():
+    headers, _, _ = call(make_app([b"x" * 1000], headers=(JSON, (b"vary", b"Origin"))), "gzip")
+    assert headers[b"vary"] == b"Origin, Accept-Encoding"
+
+
+def test_accepted_encodings_reads_q_values():
+    assert accepted_encodings("br;q=0.1, gzip, *;q=0") == {"br": 0.1, "gzip": 1.0, "*": 0.0}
+    assert accepted_encodings("gzip;q=bad, deflate") == {"deflate": 1.0}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("br;q=0.1, gzip;q=1.0", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("identity", None),
+    ("*;q=0", None),
+    ("deflate, *;q=0.5", "br"),
+    ("br, gzip", "br"),
+])
+def test_highest_quality_coding_is_chosen(accept, expected):
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    headers, _, _ = call(make_app([b"x" * 1000]), accept)
+    encoding = headers.get(b"content-encoding")
+    assert (encoding.decode() if encoding else None) == expected
+
+
+def test_gzip_is_used_when_brotli_is_missing(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    headers, _, _ = call(make_app([b"x" * 1000]), "br, gzip;q=0.5")
+    assert headers[b"content-encoding"] == b"gzip"
+
+
+def test_brotli_body_round_trips():
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    body = b"value " * 500
+    headers, bodies, _ = call(make_app([body]), "br")
+    assert headers[b"content-encoding"] == b"br"
+    assert compression.brotli.decompress(bodies[0]) == body
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.json_stream import iter_json_array
+
+ITEMS = [
+    {"Key": "config/svc/plain", "Value": "dmFsdWU="},
+    {"Key": "config/svc/braces", "Value": "a}b{c}"},
+    {"Key": "config/svc/unicode", "Value": "välüe ✓"},
+    {"Key": "config/svc/empty", "Value": None},
+]
+
+
+def parse(*chunks: bytes):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in iter_json_array(source())]
+
+    return asyncio.run(collect())
+
+
+def split(body: bytes, size: int):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("body", [b"[]", b"[ ]", b" [\n] \n", b"[\r\n\t]"])
+def test_empty_array_yields_nothing(body):
+    assert parse(body) == []
+
+
+def test_empty_array_split_across_chunks():
+    assert parse(b"[", b" ", b"]") == []
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_items_survive_every_chunk_size(indent):
+    body = json.dumps(ITEMS, indent=indent, ensure_ascii=False).encode("utf-8")
+    for size in range(1, len(body) + 1):
+        assert parse(*split(body, size)) == ITEMS, size
+
+
+def test_multibyte_character_split_between_chunks():
+    body = json.dumps([{"Key": "k", "Value": "✓"}], ensure_ascii=False).encode("utf-8")
+    cut = body.index("✓".encode("utf-8")) + 1
+    assert parse(body[:cut], body[cut:]) == [{"Key": "k", "Value": "✓"}]
+
+
+@pytest.mark.parametrize("body", [
+    b"",
+    b"[",
+    b'[{"Key": "a"',
+    b'[{"Key": "a"}',
+    b'[{"Key": "a"},',
+    b'[{"Key": "a"}, {"Key"',
+])
+def test_truncated_body_raises(body):
+    with pytest.raises(ValueError):
+        parse(body)
+
+
+def test_items_before_truncation_are_yielded():
+    seen = []
+
+    async def source():
+        yield b'[{"Key": "a"}, {"Key": "b"}, {"Ke'
+
+    async def collect():
+        async for item in iter_json_array(source()):
+            seen.append(item)
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
+    assert seen == [{"Key": "a"}, {"Key": "b"}]
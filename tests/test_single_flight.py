@@ -0,0 +1,103 @@
+import asyncio
+
+from app.services.concurrency import SingleFlight
+
+
+class Upstream:
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.release = None
+
+    async def fetch(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+            return self.started
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def run(scenario):
+    async def main():
+        upstream = Upstream()
+        upstream.release = asyncio.Event()
+        return await scenario(SingleFlight(), upstream)
+    return asyncio.run(main())
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def scenario(flights, upstream):
+        waiters = [asyncio.ensure_future(flights.do("key", "label", upstream.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiters)
+        return results, upstream.started, flights.coalesced["label"], flights._calls
+
+    results, started, coalesced, calls = run(scenario)
+    assert results == [1, 1, 1]
+    assert started == 1
+    assert coalesced == 2
+    assert calls == {}
+
+
+def test_cancelling_one_waiter_keeps_the_fetch_for_the_others():
+    async def scenario(flights, upstream):
+        first = asyncio.ensure_future(flights.do("key", "label", upstream.fetch))
+        second = asyncio.ensure_future(flights.do("key", "label", upstream.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await second, first.cancelled(), upstream.cancelled
+
+    result, first_cancelled, upstream_cancelled = run(scenario)
+    assert result == 1
+    assert first_cancelled
+    assert upstream_cancelled == 0
+
+
+def test_cancelling_the_last_waiter_cancels_the_fetch():
+    async def scenario(flights, upstream):
+        waiters = [asyncio.ensure_future(flights.do("key", "label", upstream.fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        cancelled, calls = upstream.cancelled, dict(flights._calls)
+
+        # The next caller starts a fresh fetch instead of joining the
+        # cancelled one.
+        upstream.release.set()
+        return cancelled, calls, await flights.do("key", "label", upstream.fetch)
+
+    cancelled, calls, result = run(scenario)
+    assert cancelled == 1
+    assert calls == {}
+    assert result == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario(flights, upstream):
+        async def failing():
+            upstream.started += 1
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        waiters = [asyncio.ensure_future(flights.do("key", "label", failing)) for _ in range(2)]
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return results, dict(flights._calls)
+
+    results, calls = run(scenario)
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert calls == {}
+
+
+def test_different_keys_do_not_share():
+    async def scenario(flights, upstream):
+        upstream.release.set()
+        return await asyncio.gather(flights.do("a", "label", upstream.fetch), flights.do("b", "label", upstream.fetch))
+
+    assert sorted(run(scenario)) == [1, 2]
@@ -0,0 +1,71 @@
+import asyncio
+
+from app import config
+from app.services import consul_service
+from app.services.consul_service import ConsulService
+from benchmarks.fake_consul import FakeConsul
+
+OP_OVERHEAD = 64
+
+
+def set_op(key: str, value: str = "dmFsdWU="):
+    return {"KV": {"Verb": "set", "Key": key, "Value": value}}
+
+
+def op_bytes(op) -> int:
+    return len(op["KV"]["Key"]) + len(op["KV"].get("Value", "")) + OP_OVERHEAD
+
+
+def test_no_ops_gives_no_batches():
+    assert ConsulService("a", "svc")._txn_batches([]) == []
+
+
+def test_splits_on_operation_limit(monkeypatch):
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_OPS", 3)
+    ops = [set_op(f"config/svc/k{i}") for i in range(7)]
+    batches = ConsulService("a", "svc")._txn_batches(ops)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [op for batch in batches for op in batch] == ops
+
+
+def test_splits_on_byte_limit(monkeypatch):
+    ops = [set_op(f"config/svc/k{i}", "x" * 100) for i in range(5)]
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_OPS", 64)
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_BYTES", 2 * op_bytes(ops[0]))
+    batches = ConsulService("a", "svc")._txn_batches(ops)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert all(sum(op_bytes(op) for op in batch) <= config.CONSUL_TXN_MAX_BYTES for batch in batches)
+
+
+def test_oversized_operation_gets_its_own_batch(monkeypatch):
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_BYTES", 500)
+    small, huge = set_op("config/svc/small"), set_op("config/svc/huge", "x" * 1000)
+    batches = ConsulService("a", "svc")._txn_batches([small, huge, small])
+    assert batches == [[small], [huge], [small]]
+
+
+def test_deletions_are_batched_after_writes(monkeypatch):
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_OPS", 2)
+    batches = ConsulService("a", "svc").plan_batches({"a": "1", "b": "2", "c": "3"}, ["old"])
+    verbs = [(op["KV"]["Verb"], op["KV"]["Key"]) for batch in batches for op in batch]
+    assert verbs == [("set", "config/svc/a"), ("set", "config/svc/b"), ("set", "config/svc/c"), ("delete", "config/svc/old")]
+    assert [len(batch) for batch in batches] == [2, 2]
+
+
+def test_batches_stay_within_consul_limits(monkeypatch):
+    fake = FakeConsul(max_txn_ops=5)
+    fake.load("a", {"svc": {"stale": "x"}})
+    monkeypatch.setattr(config, "CONSUL_URL_TEMPLATE", fake.url_template)
+    monkeypatch.setattr(config, "CONSUL_TXN_MAX_OPS", 5)
+    properties = {f"k{i}": f"value {i}" for i in range(23)}
+
+    async def write():
+        await consul_service.open_client(transport=fake.transport())
+        try:
+            return await ConsulService("a", "svc").apply_changes(properties, ["stale"])
+        finally:
+            await consul_service.close_client()
+
+    results = asyncio.run(write())
+    assert results == {**{key: True for key in properties}, "stale": True}
+    assert fake.services("a") == {"svc": properties}